@@ -0,0 +1,135 @@
+"""Content-hash cache of ASTBuilder output per GO batch.
+
+Each batch is keyed by a SHA-256 of its source text together with a
+fingerprint of the generated grammar, ast_listener.py and ast_walker.py
+(which decides which ASTBuilder hooks fire), so editing any of them
+invalidates every entry. Entries live in a small SQLite file and
+the least recently used ones are evicted once the cache grows past its
+size limit.
+
+Reads stay cheap: hits only queue their `last_used` update until the next
+put, flush() or close(), and the total size is tracked in memory rather
+than summed on every put.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = ".ast_cache.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_version = None
+
+
+def cache_version():
+    """Fingerprint of the generated TSqlLexer/TSqlParser, ast_listener.py and ast_walker.py.
+
+    The module files are hashed without importing them, so cache hits do not
+    pay for importing the grammar.
+    """
+    global _version
+    if _version is None:
+        h = hashlib.sha256()
+        for name in ("TSqlLexer", "TSqlParser"):
+            with open(importlib.util.find_spec(name).origin, "rb") as f:
+                h.update(f.read())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in ("ast_listener.py", "ast_walker.py"):
+            with open(os.path.join(here, name), "rb") as f:
+                h.update(f.read())
+        _version = h.hexdigest()
+    return _version
+
+
+def batch_text(tokens):
+    # Exact source text covered by a batch (comments and whitespace
+    # included, since ASTBuilder copies raw spans into the AST)
+    return tokens[0].getInputStream().getText(tokens[0].start, tokens[-1].stop)
+
+
+class ASTCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}  # key -> last_used not yet written
+        self.conn = sqlite3.connect(path, timeout=60)
+        # Commits are not fsync'ed one by one; a crash can at worst lose
+        # recently cached batches, which are simply parsed again
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS batches ("
+            " key TEXT PRIMARY KEY, ast TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS batches_last_used ON batches (last_used)")
+        self.conn.commit()
+        self.total = self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM batches").fetchone()[0]
+
+    def key(self, text):
+        h = hashlib.sha256(cache_version().encode())
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key):
+        row = self.conn.execute(
+            "SELECT ast FROM batches WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[key] = time.time()
+        return json.loads(row[0])
+
+    def put(self, key, ast):
+        data = json.dumps(ast, separators=(",", ":"))
+        self._write_touched()
+        old = self.conn.execute(
+            "SELECT size FROM batches WHERE key = ?", (key,)).fetchone()
+        self.total += len(data) - (old[0] if old else 0)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO batches (key, ast, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, data, len(data), time.time()))
+        self._evict()
+        self.conn.commit()
+
+    def _write_touched(self):
+        if self._touched:
+            self.conn.executemany(
+                "UPDATE batches SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()])
+            self._touched = {}
+
+    def flush(self):
+        """Write the queued `last_used` updates in one transaction."""
+        if self._touched:
+            self._write_touched()
+            self.conn.commit()
+
+    def _evict(self):
+        if self.total <= self.max_bytes:
+            return
+        # Other processes may share the file: recount before deleting
+        total = self._stored_bytes()
+        stale = []
+        for key, size in self.conn.execute(
+                "SELECT key, size FROM batches ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM batches WHERE key = ?", stale)
+        self.total = total
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -1,30 +1,211 @@
 import re
-from antlr4 import ParseTreeListener
+from antlr4 import ParseTreeListener, Token
 from TSqlParserListener import TSqlParserListener
-from TSqlParser import TSqlParser
+
+
+class Pattern:
+    """Precompiled heuristic regex that counts its calls and its hits."""
+    __slots__ = ("name", "regex", "calls", "hits")
+
+    def __init__(self, name, pattern, flags=0):
+        self.name = name
+        self.regex = re.compile(pattern, flags)
+        self.calls = 0
+        self.hits = 0
+
+    def search(self, text):
+        self.calls += 1
+        m = self.regex.search(text)
+        if m:
+            self.hits += 1
+        return m
+
+    def match(self, text):
+        self.calls += 1
+        m = self.regex.match(text)
+        if m:
+            self.hits += 1
+        return m
+
+    def findall(self, text):
+        self.calls += 1
+        found = self.regex.findall(text)
+        if found:
+            self.hits += 1
+        return found
+
+    def split(self, text):
+        self.calls += 1
+        parts = self.regex.split(text)
+        if len(parts) > 1:
+            self.hits += 1
+        return parts
+
+    def sub(self, repl, text):
+        self.calls += 1
+        text, count = self.regex.subn(repl, text)
+        if count:
+            self.hits += 1
+        return text
+
+
+# Registry of every heuristic pattern used by ASTBuilder, by name
+PATTERNS = {}
+
+
+def _pattern(name, pattern, flags=0):
+    PATTERNS[name] = Pattern(name, pattern, flags)
+    return PATTERNS[name]
+
+
+def pattern_stats(reset=False):
+    """{name: {"calls": n, "hits": n}} of the patterns used so far."""
+    stats = {name: {"calls": p.calls, "hits": p.hits}
+             for name, p in PATTERNS.items() if p.calls}
+    if reset:
+        for p in PATTERNS.values():
+            p.calls = p.hits = 0
+    return stats
+
+
+# normalize_sql
+OPERATOR_RE = _pattern("operator", r"([<>!=]=|[<>]|=|\+|-|\*|/)")
+SPLIT_NOT_EQUAL_RE = _pattern("split_not_equal", r"<\s*>")
+SPLIT_BANG_EQUAL_RE = _pattern("split_bang_equal", r"!\s*=")
+GLUED_IS_NOT_NULL_RE = _pattern("glued_is_not_null", r"\bIS\s*NOT\s*NULL\b", re.IGNORECASE)
+GLUED_IS_NULL_RE = _pattern("glued_is_null", r"\bIS\s*NULL\b", re.IGNORECASE)
+COMMA_NO_SPACE_RE = _pattern("comma_no_space", r",(?=\S)")
+WHITESPACE_RE = _pattern("whitespace", r"\s+")
+# Procedures, variables and DECLARE values
+PROC_NAME_RE = _pattern("proc_name", r"\b(?:CREATE|ALTER)\s+PROCEDURE\s+([^\s(]+)", re.IGNORECASE)
+ISNULL_CALL_RE = _pattern("isnull_call", r"\bISNULL\s*\(", re.IGNORECASE)
+IS_NULL_RE = _pattern("is_null", r"\bIS\s+NULL\b", re.IGNORECASE)
+IS_NOT_NULL_RE = _pattern("is_not_null", r"\bIS\s+NOT\s+NULL\b", re.IGNORECASE)
+VARIABLE_RE = _pattern("variable", r"@\w+")
+INT_LITERAL_RE = _pattern("int_literal", r"^\d+$")
+DECIMAL_LITERAL_RE = _pattern("decimal_literal", r"^\d+\.\d+$")
+# SELECT / INSERT / UPDATE / DELETE / MERGE / PRINT
+INTO_KEYWORD_RE = _pattern("into_keyword", r"\bINTO\b", re.IGNORECASE)
+SELECT_ASSIGN_RE = _pattern("select_assign", r"SELECT\s+(@\w+)\s*=\s*([^\s,]+)", re.IGNORECASE)
+FROM_TABLE_RE = _pattern("from_table", r"\bFROM\s+([^\s]+)", re.IGNORECASE)
+LEADING_IDENTIFIER_RE = _pattern("leading_identifier", r"([A-Za-z0-9_]+)")
+SELECT_INTO_VARS_RE = _pattern("select_into_vars", r"\bINTO\s+(.+?)\s+FROM", re.IGNORECASE | re.DOTALL)
+COMMA_SEPARATOR_RE = _pattern("comma_separator", r",\s*")
+INSERT_TABLE_RE = _pattern("insert_table", r"INSERT\s+INTO\s+([^\s(]+)", re.IGNORECASE)
+INSERT_COLUMNS_RE = _pattern("insert_columns", r"INSERT\s+INTO\s+[^\s(]+\s*\(([^)]+)\)", re.IGNORECASE)
+UPDATE_TABLE_RE = _pattern("update_table", r"\bUPDATE\s+([^\s]+)", re.IGNORECASE)
+UPDATE_SET_RE = _pattern("update_set", r"\bSET\b\s+(.*?)(?:\bWHERE\b|$)", re.IGNORECASE | re.DOTALL)
+DELETE_TABLE_RE = _pattern("delete_table", r"(FROM|DELETE)\s+([^\s]+)", re.IGNORECASE)
+MERGE_TABLE_RE = _pattern("merge_table", r"MERGE\s+INTO\s+([^\s]+)", re.IGNORECASE)
+PRINT_MESSAGE_RE = _pattern("print_message", r"PRINT\s*'([^']+)'", re.IGNORECASE)
+# Cursors
+CURSOR_QUERY_RE = _pattern("cursor_query", r"FOR\s+(SELECT.+)", re.IGNORECASE)
+WORD_RE = _pattern("word", r"\b(\w+)\b")
+FETCH_FROM_RE = _pattern("fetch_from", r"\bFROM\s+([A-Za-z0-9_#]+)", re.IGNORECASE)
+FETCH_INTO_RE = _pattern("fetch_into", r"\bINTO\s+(.+)", re.IGNORECASE)
+# CREATE TABLE column and table constraints
+COLUMN_DEFAULT_RE = _pattern("column_default", r"DEFAULT\s+([^\s,)]+)", re.IGNORECASE)
+COLUMN_CHECK_RE = _pattern("column_check", r"CHECK\s*\((.*?)\)", re.IGNORECASE)
+COMPUTED_COLUMN_RE = _pattern("computed_column", r"AS\s*\((.*?)\)\s*(PERSISTED)?", re.IGNORECASE)
+CONSTRAINT_NAME_RE = _pattern("constraint_name", r"CONSTRAINT\s+([^\s]+)", re.IGNORECASE)
+PAREN_LIST_RE = _pattern("paren_list", r'\((.*?)\)')
+FOREIGN_KEY_RE = _pattern("foreign_key", r'FOREIGN\s+KEY\s*\((.*?)\)', re.IGNORECASE)
+REFERENCES_TABLE_RE = _pattern("references_table", r'REFERENCES\s+([^\s(]+)', re.IGNORECASE)
+REFERENCES_COLUMNS_RE = _pattern("references_columns", r'REFERENCES\s+[^\s(]+\s*\((.*?)\)', re.IGNORECASE)
+TABLE_CHECK_RE = _pattern("table_check", r"CHECK\s*\((.+?)\)", re.IGNORECASE)
 
 
 def normalize_sql(sql_text):
-    sql_text = re.sub(r"([<>!=]=|[<>]|=|\+|-|\*|/)", r" \1 ", sql_text)
-    sql_text = re.sub(r"<\s*>", "<>", sql_text)  # normalize < >
-    sql_text = re.sub(r"!\s*=", "!=", sql_text)  # normalize ! =
-    sql_text = re.sub(r"\bIS\s*NOT\s*NULL\b", "IS NOT NULL",
-                      sql_text, flags=re.IGNORECASE)
-    sql_text = re.sub(r"\bIS\s*NULL\b", "IS NULL",
-                      sql_text, flags=re.IGNORECASE)
-    sql_text = re.sub(r",(?=\S)", ", ", sql_text)
-    sql_text = re.sub(r"\s+", " ", sql_text)
+    sql_text = OPERATOR_RE.sub(r" \1 ", sql_text)
+    sql_text = SPLIT_NOT_EQUAL_RE.sub("<>", sql_text)  # normalize < >
+    sql_text = SPLIT_BANG_EQUAL_RE.sub("!=", sql_text)  # normalize ! =
+    sql_text = GLUED_IS_NOT_NULL_RE.sub("IS NOT NULL", sql_text)
+    sql_text = GLUED_IS_NULL_RE.sub("IS NULL", sql_text)
+    sql_text = COMMA_NO_SPACE_RE.sub(", ", sql_text)
+    sql_text = WHITESPACE_RE.sub(" ", sql_text)
     return sql_text.strip().rstrip(";")
 
 
+# Operators that normalize_sql pads with spaces
+SQL_OPERATORS = {"=", "<", ">", "<=", ">=", "<>", "!=", "!<", "!>",
+                 "+", "-", "*", "/", "+=", "-=", "*=", "/=", "%=", "&=", "^=", "|="}
+
+
+def normalize_tokens(tokens, glued=False):
+    """Token-level equivalent of normalize_sql for default-channel tokens.
+
+    Whitespace between tokens in the source becomes one space (with
+    glued=True it is ignored, matching normalize_sql over ctx.getText()).
+    Operators are padded, commas are followed by a space, IS [NOT] NULL is
+    spelled out and trailing semicolons are dropped. Token text itself,
+    e.g. a string literal, is copied verbatim.
+    """
+    end = len(tokens)
+    while end and tokens[end - 1].text == ";":
+        end -= 1
+
+    out = []
+    prev_stop = None
+    prev_spaced = False  # previous word was an operator or a comma
+    i = 0
+    while i < end:
+        tok = tokens[i]
+        text = tok.text
+        stop = tok.stop
+        upper = text.upper()
+        nxt = tokens[i + 1] if i + 1 < end else None
+
+        # The lexer splits <>, !=, <=, >=, !<, !> into two tokens
+        if text in ("<", ">", "!") and nxt is not None:
+            pair = text + nxt.text
+            if pair in ("<>", "!=") or (
+                    nxt.start == stop + 1 and pair in ("<=", ">=", "!<", "!>")):
+                text = pair
+                stop = nxt.stop
+                i += 1
+        elif upper == "IS" and nxt is not None:
+            words = [t.text.upper() for t in tokens[i + 1:min(i + 3, end)]]
+            # normalize_sql only matches IS [NOT] NULL on a word boundary,
+            # which glued text like "@RateISNULL" does not have
+            glued_to_word = glued and out and not prev_spaced and (
+                out[-1][-1].isalnum() or out[-1][-1] == "_")
+            if words[:1] == ["NULL"]:
+                text = text + nxt.text if glued_to_word else "IS NULL"
+                stop = nxt.stop
+                i += 1
+            elif words == ["NOT", "NULL"]:
+                text = "".join(t.text for t in tokens[i:i + 3]) if glued_to_word else "IS NOT NULL"
+                stop = tokens[i + 2].stop
+                i += 2
+
+        is_op = text in SQL_OPERATORS
+        if out and (is_op or prev_spaced or (
+                not glued and tok.start > prev_stop + 1)):
+            out.append(" ")
+        out.append(text)
+        prev_stop = stop
+        prev_spaced = is_op or text == ","
+        i += 1
+    return "".join(out)
+
+
+# Enclosing constructs tracked on ASTBuilder's context stack
+CONTEXTS = ("CURSOR", "CURSOR_QUERY", "INSERT", "CATCH")
+
+
 class ASTBuilder(TSqlParserListener):
-    def __init__(self):
+    def __init__(self, emit=None):
         self.ast = []
+        # Optional callback receiving each finished top-level node
+        # (procedure, CREATE SCHEMA) instead of collecting it in self.ast
+        self.emit = emit
         self.proc_stack = []
         self.current_proc = None
         self.current_block_body = None
         self.statement_stack = []  # stack for statements
-        self.in_catch_block = False
+        # Enclosing CONTEXTS, innermost last, and how many of each are open
+        self.context_stack = []
+        self._open = dict.fromkeys(CONTEXTS, 0)
         self.cursor_blocks = {}
         self.block_stack = []
         self.last_if_block = None
@@ -33,6 +214,107 @@ class ASTBuilder(TSqlParserListener):
         self.in_with_clause = False
         self.collect_main_query = False
         self.schema_metadata = {}
+        # id(statement list) -> [list, {(type, query): [stmts]}, items indexed]
+        self._stmt_index = {}
+        # Symbol table of the current procedure:
+        # NAME.upper() -> ("param" | "variable", record in params/variables)
+        self.symbols = {}
+
+    def source_text(self, ctx):
+        """Source text of ctx, sliced from the input stream."""
+        return ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
+
+    def flat_text(self, ctx):
+        """source_text(ctx) with each run of whitespace collapsed to one space."""
+        return " ".join(self.source_text(ctx).split())
+
+    def glued_text(self, ctx):
+        """ctx.getText(): the token texts without whitespace."""
+        return ctx.getText()
+
+    def _normalize_range(self, ctx, start, stop, glued=False):
+        stream = ctx.parser.getTokenStream()
+        tokens = [t for t in stream.tokens[start:stop + 1]
+                  if t.channel == Token.DEFAULT_CHANNEL]
+        return normalize_tokens(tokens, glued)
+
+    def normalize_ctx(self, ctx, glued=False):
+        """normalize_sql of ctx's source text (glued=True: of ctx.getText()),
+        built from the already-lexed tokens."""
+        return self._normalize_range(ctx, ctx.start.tokenIndex, ctx.stop.tokenIndex, glued)
+
+    def _push_context(self, kind):
+        self.context_stack.append(kind)
+        self._open[kind] += 1
+
+    def _pop_context(self, kind):
+        # Enter/exit hooks nest, so the innermost context should be `kind`;
+        # if it is not, report it and resync rather than let the stack skew
+        # in_insert / in_cursor / in_catch_block for the rest of the batch
+        if self.context_stack and self.context_stack[-1] == kind:
+            self.context_stack.pop()
+            self._open[kind] -= 1
+            return
+        print(f"❌ Context stack out of step: closing {kind}, open {self.context_stack}")
+        if kind in self.context_stack:
+            # Close `kind` and everything opened inside it
+            while self.context_stack:
+                closed = self.context_stack.pop()
+                self._open[closed] -= 1
+                if closed == kind:
+                    break
+
+    def inside(self, kind):
+        """True while any `kind` construct (one of CONTEXTS) is open."""
+        return self._open[kind] > 0
+
+    @property
+    def in_insert(self):
+        return self._open["INSERT"] > 0
+
+    @property
+    def in_cursor(self):
+        return self._open["CURSOR"] > 0
+
+    @property
+    def in_catch_block(self):
+        return self._open["CATCH"] > 0
+
+    def _add_top_level(self, node):
+        if self.emit is None:
+            self.ast.append(node)
+            return
+        self.emit(node)
+        if not self.proc_stack:
+            # The statement index holds on to the emitted procedure's
+            # statement lists; drop it so the procedure can be freed
+            self._stmt_index = {}
+
+    def _declare_symbol(self, record, kind):
+        # First declaration wins, like the first match of a list scan
+        self.symbols.setdefault(record["name"].upper(), (kind, record))
+
+    def _lookup_symbol(self, name):
+        return self.symbols.get(name.upper(), (None, None))
+
+    def _statement_index(self, target):
+        # Lazily catch the index up with anything appended to the list
+        # since the last lookup (including direct appends)
+        entry = self._stmt_index.get(id(target))
+        if entry is None or entry[0] is not target:
+            entry = [target, {}, 0]
+            self._stmt_index[id(target)] = entry
+        index = entry[1]
+        for s in target[entry[2]:]:
+            index.setdefault((s.get("type"), s.get("query")), []).append(s)
+        entry[2] = len(target)
+        return index
+
+    def _contains_statement(self, target, stmt):
+        # Same as `stmt in target`, but only compares same (type, query)
+        matches = self._statement_index(target).get(
+            (stmt.get("type"), stmt.get("query")), ())
+        return any(s == stmt for s in matches)
 
     def _append_statement(self, stmt):
         try:
@@ -45,8 +327,9 @@ class ASTBuilder(TSqlParserListener):
                 return
 
             # Check if an identical type+query already exists
-            existing = next((s for s in target if s.get("type") == stmt.get(
-                "type") and s.get("query") == stmt.get("query")), None)
+            matches = self._statement_index(target).get(
+                (stmt.get("type"), stmt.get("query")))
+            existing = matches[0] if matches else None
             if existing:
                 # Merge missing fields (e.g., columns)
                 for k, v in stmt.items():
@@ -63,10 +346,10 @@ class ASTBuilder(TSqlParserListener):
                         "type": "RAW_SQL",
                         "query": f"DROP {'TABLE' if t == 'DROP_TABLE' else 'PROCEDURE'} {stmt.get('table') or stmt.get('procedure')}"
                     }
-                    if raw_sql not in self.last_if_block["then"]:
+                    if not self._contains_statement(self.last_if_block["then"], raw_sql):
                         self.last_if_block["then"].append(raw_sql)
                 elif t == "RAW_SQL" and stmt.get("query", "").upper().startswith("DROP "):
-                    if stmt not in self.last_if_block["then"]:
+                    if not self._contains_statement(self.last_if_block["then"], stmt):
                         self.last_if_block["then"].append(stmt)
 
         except Exception as e:
@@ -86,12 +369,10 @@ class ASTBuilder(TSqlParserListener):
     def enterCreate_or_alter_procedure(self, ctx):
         try:
             # Get full text from the input stream
-            text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-            flat = " ".join(text.replace("\n", " ").split())
+            flat = self.flat_text(ctx)
 
             # Extract procedure name using regex (handles schema and brackets)
-            m = re.search(
-                r"\b(?:CREATE|ALTER)\s+PROCEDURE\s+([^\s(]+)", flat, re.IGNORECASE)
+            m = PROC_NAME_RE.search(flat)
             proc_name = m.group(1) if m else "<UNKNOWN_PROC>"
 
             self.current_proc = {
@@ -102,6 +383,8 @@ class ASTBuilder(TSqlParserListener):
                 "statements": []
             }
 
+            self.symbols = {}
+
             # Add to procedure stack
             self.proc_stack.append(self.current_proc)
             self.statement_stack.append(self.current_proc["statements"])
@@ -113,7 +396,7 @@ class ASTBuilder(TSqlParserListener):
         try:
             proc_obj = self.proc_stack.pop()
             # Do NOT merge global statements into the procedure
-            self.ast.append(proc_obj)
+            self._add_top_level(proc_obj)
             self.statement_stack.pop()
             self.current_proc = None
         except Exception as e:
@@ -124,7 +407,7 @@ class ASTBuilder(TSqlParserListener):
             ids = ctx.id_()
             if ids:
                 schema_name = ids[0].getText()  # Safely access the first ID
-                self.ast.append({
+                self._add_top_level({
                     "type": "CREATE_SCHEMA",
                     "schema_name": schema_name
                 })
@@ -140,12 +423,12 @@ class ASTBuilder(TSqlParserListener):
             decls = []
             for decl in ctx.declare_local():
                 var_name = decl.LOCAL_ID().getText()
-                var_type = normalize_sql(
-                    decl.data_type().getText()) if decl.data_type() else "<UNKNOWN>"
-                default_val = normalize_sql(
-                    decl.expression().getText()) if decl.expression() else None
+                var_type = self.normalize_ctx(
+                    decl.data_type(), glued=True) if decl.data_type() else "<UNKNOWN>"
+                default_val = self.normalize_ctx(
+                    decl.expression(), glued=True) if decl.expression() else None
 
-                if getattr(self, "in_catch_block", False):
+                if self.in_catch_block:
                     # Inside CATCH → add to CATCH block
                     if not any(d["name"] == var_name for d in decls):
                         decls.append({"name": var_name, "type": var_type})
@@ -153,13 +436,12 @@ class ASTBuilder(TSqlParserListener):
                     # Normal procedure-level variable
                     self._ensure_variable_exists(var_name, var_type)
                     if default_val:
-                        for v in self.current_proc["variables"]:
-                            if v["name"] == var_name:
-                                v["default"] = default_val
-                                break
+                        kind, v = self._lookup_symbol(var_name)
+                        if kind == "variable":
+                            v["default"] = default_val
 
             # Append DECLARE statement inside CATCH
-            if getattr(self, "in_catch_block", False) and decls:
+            if self.in_catch_block and decls:
                 self._append_statement({"type": "DECLARE", "variables": decls})
 
         except Exception as e:
@@ -182,30 +464,29 @@ class ASTBuilder(TSqlParserListener):
             return
 
         # ❌ Ignore variables inside CATCH block
-        if getattr(self, "in_catch_block", False):
+        if self.in_catch_block:
             return
 
-        # Check if variable already exists
-        existing = next(
-            (v for v in self.current_proc["variables"] if v["name"] == var_name), None)
+        # Check if variable (or a param of the same name) already exists
+        kind, existing = self._lookup_symbol(var_name)
         if existing:
-            if existing["type"] == "<UNKNOWN>" and inferred_type:
+            if kind == "variable" and existing["type"] == "<UNKNOWN>" and inferred_type:
                 existing["type"] = inferred_type
             return
 
         # If new variable, add with inferred or UNKNOWN type
-        self.current_proc["variables"].append({
+        var_obj = {
             "name": var_name,
             "type": inferred_type if inferred_type else "<UNKNOWN>"
-        })
+        }
+        self.current_proc["variables"].append(var_obj)
+        self._declare_symbol(var_obj, "variable")
 
     def _extract_vars(self, text):
-        clean_text = re.sub(r"\bISNULL\s*\(", "(", text, flags=re.IGNORECASE)
-        clean_text = re.sub(r"\bIS\s+NULL\b", "",
-                            clean_text, flags=re.IGNORECASE)
-        clean_text = re.sub(r"\bIS\s+NOT\s+NULL\b", "",
-                            clean_text, flags=re.IGNORECASE)
-        all_vars = re.findall(r"@\w+", clean_text)
+        clean_text = ISNULL_CALL_RE.sub("(", text)
+        clean_text = IS_NULL_RE.sub("", clean_text)
+        clean_text = IS_NOT_NULL_RE.sub("", clean_text)
+        all_vars = VARIABLE_RE.findall(clean_text)
         return [v for v in all_vars if not v.startswith('@@')]
 
     def enterTry_catch_statement(self, ctx):
@@ -234,8 +515,8 @@ class ASTBuilder(TSqlParserListener):
             print(f"❌ Error in exitTry_catch_statement: {e}")
 
     def enterCatch_handler(self, ctx):
+        self._push_context("CATCH")
         try:
-            self.in_catch_block = True
             self.current_catch_block = {"type": "BEGIN_CATCH", "body": []}
             # Push its body so inner statements go inside
             self.statement_stack.append(self.current_catch_block["body"])
@@ -243,8 +524,8 @@ class ASTBuilder(TSqlParserListener):
             print(f"❌ Error in enterCatch_handler: {e}")
 
     def exitCatch_handler(self, ctx):
+        self._pop_context("CATCH")
         try:
-            self.in_catch_block = False
             if self.statement_stack:
                 self.statement_stack.pop()
             if self.current_catch_block:
@@ -255,19 +536,23 @@ class ASTBuilder(TSqlParserListener):
 
     def enterSet_statement(self, ctx):
         try:
-            text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-            text = " ".join(text.replace("\n", " ").split())
+            text = self.flat_text(ctx)
 
             if "=" in text:
                 parts = text.split("=", 1)
                 name = parts[0].replace("SET", "", 1).strip()
-                value = normalize_sql(parts[1].strip())
+
+                # Value: the tokens after the first "=" (or "+=", ...)
+                tokens = ctx.parser.getTokenStream().tokens
+                eq = next(i for i in range(ctx.start.tokenIndex, ctx.stop.tokenIndex + 1)
+                          if tokens[i].channel == Token.DEFAULT_CHANNEL and "=" in tokens[i].text)
+                value = self._normalize_range(ctx, eq + 1, ctx.stop.tokenIndex)
 
                 # Type inference
                 inferred_type = None
-                if re.match(r"^\d+$", value):
+                if INT_LITERAL_RE.match(value):
                     inferred_type = "INT"
-                elif re.match(r"^\d+\.\d+$", value):
+                elif DECIMAL_LITERAL_RE.match(value):
                     inferred_type = "DECIMAL(18,2)"
                 elif value.upper().startswith("GETDATE()"):
                     inferred_type = "DATE"
@@ -287,7 +572,7 @@ class ASTBuilder(TSqlParserListener):
             print(f"Error in enterSet_statement: {e}")
 
     def enterReturn_statement(self, ctx):
-        text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
+        text = self.source_text(ctx)
         expr = text.strip().split("RETURN", 1)[-1].strip()
         self._append_statement({
             "type": "RETURN",
@@ -295,7 +580,7 @@ class ASTBuilder(TSqlParserListener):
         })
 
     def _is_select_into(self, sql: str) -> bool:
-        return bool(re.search(r"\bINTO\b", sql, re.IGNORECASE))
+        return bool(INTO_KEYWORD_RE.search(sql))
 
     def enterSelect_statement(self, ctx):
         # ✅ Skip SELECT inside a CTE (we already processed it in enterCommon_table_expression)
@@ -307,9 +592,7 @@ class ASTBuilder(TSqlParserListener):
         if getattr(self, 'waiting_for_main_select', False):
             self.waiting_for_main_select = False
             try:
-                raw_sql = ctx.start.getInputStream().getText(
-                    ctx.start.start, ctx.stop.stop).strip()
-                normalized_sql = normalize_sql(raw_sql)
+                normalized_sql = self.normalize_ctx(ctx)
 
                 if hasattr(self, 'current_ctes_block') and self.current_ctes_block:
                     self.current_ctes_block["main_query"] = {
@@ -324,32 +607,19 @@ class ASTBuilder(TSqlParserListener):
                 return
 
         try:
-            # ✅ Check if inside cursor declaration
-            parent = ctx.parentCtx
-            inside_cursor = False
-            while parent:
-                if type(parent).__name__ == "Declare_set_cursor_commonContext":
-                    inside_cursor = True
-                    break
-                parent = parent.parentCtx
-
-            raw_sql = ctx.start.getInputStream().getText(
-                ctx.start.start, ctx.stop.stop).strip()
-            normalized_sql = normalize_sql(raw_sql)
+            normalized_sql = self.normalize_ctx(ctx)
 
             # ✅ Detect SELECT assignment → convert to SET
-            assign_match = re.match(
-                r"SELECT\s+(@\w+)\s*=\s*([^\s,]+)", normalized_sql, re.IGNORECASE)
+            assign_match = SELECT_ASSIGN_RE.match(normalized_sql)
             if assign_match:
                 target_var = assign_match.group(1).strip()
-                value_expr = normalize_sql(assign_match.group(2).strip())
+                value_expr = assign_match.group(2).strip()
 
                 # Infer type from schema if possible
-                from_match = re.search(
-                    r"\bFROM\s+([^\s]+)", normalized_sql, re.IGNORECASE)
+                from_match = FROM_TABLE_RE.search(normalized_sql)
                 from_table = from_match.group(
                     1).strip() if from_match else None
-                col_match = re.match(r"([A-Za-z0-9_]+)", value_expr)
+                col_match = LEADING_IDENTIFIER_RE.match(value_expr)
                 col_name = col_match.group(1) if col_match else None
                 inferred_type = None
                 if col_name and from_table:
@@ -368,12 +638,11 @@ class ASTBuilder(TSqlParserListener):
             # ✅ Detect SELECT INTO
             if self._is_select_into(normalized_sql):
                 into_vars = []
-                match = re.search(r"\bINTO\s+(.+?)\s+FROM",
-                                  normalized_sql, re.IGNORECASE | re.DOTALL)
+                match = SELECT_INTO_VARS_RE.search(normalized_sql)
                 if match:
                     into_part = match.group(1)
                     into_vars = [v.strip()
-                                 for v in re.split(r",\s*", into_part)]
+                                 for v in COMMA_SEPARATOR_RE.split(into_part)]
                 for var in into_vars:
                     self._ensure_variable_exists(var, None)
                 self._append_statement({
@@ -384,10 +653,11 @@ class ASTBuilder(TSqlParserListener):
                 return
 
             # ✅ Skip SELECT inside an INSERT or CURSOR
-            if getattr(self, 'in_insert', False):
+            if self.in_insert:
                 return
 
-            if inside_cursor:
+            # ✅ SELECT of a cursor declaration (DECLARE/SET ... CURSOR FOR SELECT)
+            if self.inside("CURSOR_QUERY"):
                 self.current_cursor_columns = self._extract_select_columns(
                     normalized_sql)
                 return  # Do NOT append as standalone SELECT
@@ -404,11 +674,10 @@ class ASTBuilder(TSqlParserListener):
     def _update_variable_type(self, var_name, new_type):
         if not self.current_proc or not new_type:
             return
-        for v in self.current_proc["variables"]:
-            if v["name"].upper() == var_name.upper():
-                if v["type"] == "<UNKNOWN>" or v["type"] == "INT":  # Replace generic type
-                    v["type"] = new_type
-                return
+        kind, v = self._lookup_symbol(var_name)
+        if kind == "variable":
+            if v["type"] == "<UNKNOWN>" or v["type"] == "INT":  # Replace generic type
+                v["type"] = new_type
 
     def _extract_select_columns(self, sql):
         # Simple extraction for now: split by commas until FROM
@@ -420,22 +689,19 @@ class ASTBuilder(TSqlParserListener):
         return cols
 
     def enterInsert_statement(self, ctx):
-        self.in_insert = True
+        self._push_context("INSERT")
         try:
-            raw_text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-            query = normalize_sql(raw_text)
+            query = self.normalize_ctx(ctx)
 
             # Extract table name
             table_name = ""
-            match = re.search(
-                r"INSERT\s+INTO\s+([^\s(]+)", query, re.IGNORECASE)
+            match = INSERT_TABLE_RE.search(query)
             if match:
                 table_name = match.group(1)
 
             # Extract column list (if present)
             columns = []
-            col_match = re.search(
-                r"INSERT\s+INTO\s+[^\s(]+\s*\(([^)]+)\)", query, re.IGNORECASE)
+            col_match = INSERT_COLUMNS_RE.search(query)
             if col_match:
                 columns = [c.strip() for c in col_match.group(1).split(",")]
 
@@ -451,23 +717,21 @@ class ASTBuilder(TSqlParserListener):
             print(f"❌ Error parsing INSERT: {e}")
 
     def exitInsert_statement(self, ctx):
-        self.in_insert = False
+        self._pop_context("INSERT")
 
     def enterUpdate_statement(self, ctx):
         try:
-            raw_text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-            query = normalize_sql(raw_text)
+            query = self.normalize_ctx(ctx)
 
             # Extract table name
             table_name = ""
-            match = re.search(r"\bUPDATE\s+([^\s]+)", query, re.IGNORECASE)
+            match = UPDATE_TABLE_RE.search(query)
             if match:
                 table_name = match.group(1)
 
             # Extract columns from SET clause
             columns = []
-            set_match = re.search(
-                r"\bSET\b\s+(.*?)(?:\bWHERE\b|$)", query, re.IGNORECASE | re.DOTALL)
+            set_match = UPDATE_SET_RE.search(query)
             if set_match:
                 set_clause = set_match.group(1)
                 for assignment in set_clause.split(","):
@@ -490,13 +754,11 @@ class ASTBuilder(TSqlParserListener):
 
     def enterDelete_statement(self, ctx):
         try:
-            raw_text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-            query = normalize_sql(raw_text)
+            query = self.normalize_ctx(ctx)
 
             # Extract table name after FROM or DELETE
             table_name = ""
-            match = re.search(
-                r"(FROM|DELETE)\s+([^\s]+)", query, re.IGNORECASE)
+            match = DELETE_TABLE_RE.search(query)
             if match:
                 table_name = match.group(2)
 
@@ -512,12 +774,11 @@ class ASTBuilder(TSqlParserListener):
 
     def enterMerge_statement(self, ctx):
         try:
-            raw_text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-            query = normalize_sql(raw_text)
+            query = self.normalize_ctx(ctx)
 
             # Extract target table after MERGE INTO
             table_name = ""
-            match = re.search(r"MERGE\s+INTO\s+([^\s]+)", query, re.IGNORECASE)
+            match = MERGE_TABLE_RE.search(query)
             if match:
                 table_name = match.group(1)
 
@@ -546,8 +807,8 @@ class ASTBuilder(TSqlParserListener):
 
     def enterIf_statement(self, ctx):
         try:
-            condition = normalize_sql(ctx.search_condition().getText(
-            )) if ctx.search_condition() else "<UNKNOWN_CONDITION>"
+            condition = self.normalize_ctx(
+                ctx.search_condition(), glued=True) if ctx.search_condition() else "<UNKNOWN_CONDITION>"
             if_block = {
                 "type": "IF",
                 "condition": condition,
@@ -603,7 +864,7 @@ class ASTBuilder(TSqlParserListener):
 
     def enterWhile_statement(self, ctx):
         try:
-            condition = normalize_sql(ctx.search_condition().getText())
+            condition = self.normalize_ctx(ctx.search_condition(), glued=True)
 
             # ✅ Detect FETCH loop pattern: WHILE @@FETCH_STATUS = 0
             if condition.upper().replace(" ", "") == "@@FETCH_STATUS=0":
@@ -692,8 +953,8 @@ class ASTBuilder(TSqlParserListener):
 
     def enterPrint_statement(self, ctx):
         try:
-            text = ctx.getText()
-            match = re.search(r"PRINT\s*'([^']+)'", text, re.IGNORECASE)
+            text = self.glued_text(ctx)
+            match = PRINT_MESSAGE_RE.search(text)
             message = match.group(1) if match else text
             self._append_statement({
                 "type": "RAISE",
@@ -715,15 +976,12 @@ class ASTBuilder(TSqlParserListener):
 
     def enterRaiseerror_statement(self, ctx):
         try:
-            # Extract full RAISERROR text as written in SQL
-            full_text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-
-            # Normalize the text (remove extra spaces, line breaks)
+            # Normalize the RAISERROR text (remove extra spaces, line breaks)
             raise_stmt = {
                 "type": "RAISE",
                 "level": "ERROR",
                 # Keep original RAISERROR syntax
-                "message": normalize_sql(full_text)
+                "message": self.normalize_ctx(ctx)
             }
 
             # Append to the current statement stack
@@ -762,21 +1020,20 @@ class ASTBuilder(TSqlParserListener):
             print(f"Error in enterRollback_transaction: {e}")
 
     def enterDeclare_cursor(self, ctx):
-        self.in_cursor = True
+        self._push_context("CURSOR")
         try:
             cursor_name = ctx.cursor_name().getText() if ctx.cursor_name() else "<UNKNOWN>"
 
             # ✅ Extract query text from full text (since select_statement() may not exist)
-            raw_text = ctx.getText()
-            query_match = re.search(
-                r"FOR\s+(SELECT.+)", raw_text, re.IGNORECASE)
+            raw_text = self.glued_text(ctx)
+            query_match = CURSOR_QUERY_RE.search(raw_text)
             query_text = query_match.group(
                 1) if query_match else "<MISSING QUERY>"
             query_text = normalize_sql(query_text)
 
             # ✅ Extract column info (best effort)
             columns = []
-            col_match = re.findall(r"\b(\w+)\b", query_text)
+            col_match = WORD_RE.findall(query_text)
             for col_name in col_match:
                 # Infer type from simple heuristic
                 if "ID" in col_name.upper():
@@ -802,7 +1059,13 @@ class ASTBuilder(TSqlParserListener):
             print(f"Error in enterDeclare_cursor: {e}")
 
     def exitDeclare_cursor(self, ctx):
-        self.in_cursor = False
+        self._pop_context("CURSOR")
+
+    def enterDeclare_set_cursor_common(self, ctx):
+        self._push_context("CURSOR_QUERY")
+
+    def exitDeclare_set_cursor_common(self, ctx):
+        self._pop_context("CURSOR_QUERY")
 
     def enterOpen_cursor(self, ctx):
         try:
@@ -823,8 +1086,8 @@ class ASTBuilder(TSqlParserListener):
                 cursor_name = ctx.cursor_name().getText()
             elif hasattr(ctx, "children"):
                 # Fallback: scan tokens around FROM
-                txt = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-                m = re.search(r"\bFROM\s+([A-Za-z0-9_#]+)", txt, re.IGNORECASE)
+                txt = self.source_text(ctx)
+                m = FETCH_FROM_RE.search(txt)
                 cursor_name = m.group(1) if m else "<UNKNOWN>"
             else:
                 cursor_name = "<UNKNOWN>"
@@ -834,8 +1097,8 @@ class ASTBuilder(TSqlParserListener):
             if hasattr(ctx, "LOCAL_ID") and ctx.LOCAL_ID():
                 fetch_into = [v.getText() for v in ctx.LOCAL_ID()]
             else:
-                full_text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-                m = re.search(r"\bINTO\s+(.+)", full_text, re.IGNORECASE)
+                full_text = self.source_text(ctx)
+                m = FETCH_INTO_RE.search(full_text)
                 if m:
                     fetch_into = [v.strip() for v in m.group(1).split(",")]
 
@@ -902,7 +1165,7 @@ class ASTBuilder(TSqlParserListener):
 
     def enterCreate_table(self, ctx):
         try:
-            raw_text = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
+            raw_text = self.source_text(ctx)
 
             # Detect table name
             table_name = ""
@@ -942,7 +1205,7 @@ class ASTBuilder(TSqlParserListener):
                     if col_def:
                         col_name = col_def.id_().getText()
                         col_type = col_def.data_type().getText()
-                        col_text = col_def.getText()
+                        col_text = self.glued_text(col_def)
                         upper_col_text = col_text.upper()
 
                         # ✅ For Tool 5: columns as strings
@@ -968,8 +1231,7 @@ class ASTBuilder(TSqlParserListener):
                                 {"type": "NOT_NULL", "column": col_name})
 
                         if "DEFAULT" in upper_col_text:
-                            match = re.search(
-                                r"DEFAULT\s+([^\s,)]+)", col_text, re.IGNORECASE)
+                            match = COLUMN_DEFAULT_RE.search(col_text)
                             if match:
                                 table_stmt["constraints"].append({
                                     "type": "DEFAULT",
@@ -978,8 +1240,7 @@ class ASTBuilder(TSqlParserListener):
                                 })
 
                         if "CHECK" in upper_col_text:
-                            match = re.search(
-                                r"CHECK\s*\((.*?)\)", col_text, re.IGNORECASE)
+                            match = COLUMN_CHECK_RE.search(col_text)
                             if match:
                                 table_stmt["constraints"].append({
                                     "type": "CHECK",
@@ -988,8 +1249,7 @@ class ASTBuilder(TSqlParserListener):
 
                         # Computed columns
                         if "AS" in upper_col_text and "(" in col_text:
-                            match = re.search(
-                                r"AS\s*\((.*?)\)\s*(PERSISTED)?", col_text, re.IGNORECASE)
+                            match = COMPUTED_COLUMN_RE.search(col_text)
                             if match:
                                 expr = normalize_sql(match.group(1))
                                 constraint = {
@@ -999,19 +1259,18 @@ class ASTBuilder(TSqlParserListener):
                                 table_stmt["constraints"].append(constraint)
 
                     elif item.table_constraint():
-                        tcon_text = item.getText()
+                        tcon_text = self.glued_text(item)
                         tcon_upper = tcon_text.upper()
 
                         # Optional constraint name
                         constraint_name = None
-                        match_name = re.search(
-                            r"CONSTRAINT\s+([^\s]+)", tcon_text, re.IGNORECASE)
+                        match_name = CONSTRAINT_NAME_RE.search(tcon_text)
                         if match_name:
                             constraint_name = match_name.group(1)
 
                         # PRIMARY KEY
                         if "PRIMARY" in tcon_upper and "KEY" in tcon_upper:
-                            cols = re.findall(r'\((.*?)\)', tcon_text)
+                            cols = PAREN_LIST_RE.findall(tcon_text)
                             if cols:
                                 col_list = [c.strip()
                                             for c in cols[0].split(',')]
@@ -1023,12 +1282,9 @@ class ASTBuilder(TSqlParserListener):
 
                         # FOREIGN KEY
                         if "FOREIGN KEY" in tcon_upper and "REFERENCES" in tcon_upper:
-                            fk_cols_match = re.search(
-                                r'FOREIGN\s+KEY\s*\((.*?)\)', tcon_text, re.IGNORECASE)
-                            ref_table_match = re.search(
-                                r'REFERENCES\s+([^\s(]+)', tcon_text, re.IGNORECASE)
-                            ref_cols_match = re.search(
-                                r'REFERENCES\s+[^\s(]+\s*\((.*?)\)', tcon_text, re.IGNORECASE)
+                            fk_cols_match = FOREIGN_KEY_RE.search(tcon_text)
+                            ref_table_match = REFERENCES_TABLE_RE.search(tcon_text)
+                            ref_cols_match = REFERENCES_COLUMNS_RE.search(tcon_text)
                             if fk_cols_match and ref_table_match and ref_cols_match:
                                 fk_col_list = [
                                     c.strip() for c in fk_cols_match.group(1).split(',')]
@@ -1046,8 +1302,7 @@ class ASTBuilder(TSqlParserListener):
 
                         # CHECK
                         if "CHECK" in tcon_upper:
-                            check_expr = re.search(
-                                r"CHECK\s*\((.+?)\)", tcon_text, re.IGNORECASE)
+                            check_expr = TABLE_CHECK_RE.search(tcon_text)
                             if check_expr:
                                 constraint = {"type": "CHECK", "expression": normalize_sql(
                                     check_expr.group(1).strip())}
@@ -1057,7 +1312,7 @@ class ASTBuilder(TSqlParserListener):
 
                         # UNIQUE
                         if "UNIQUE" in tcon_upper:
-                            cols = re.findall(r'\((.*?)\)', tcon_text)
+                            cols = PAREN_LIST_RE.findall(tcon_text)
                             if cols:
                                 col_list = [c.strip()
                                             for c in cols[0].split(',')]
@@ -1101,15 +1356,9 @@ class ASTBuilder(TSqlParserListener):
             cte_name = ctx.id_().getText() if ctx.id_() else "<UNKNOWN_CTE>"
 
             if ctx.select_statement():
-                start_index = ctx.select_statement().start.start
-                stop_index = ctx.select_statement().stop.stop
-                token_stream = ctx.start.getInputStream()
-                inner_query_text = token_stream.getText(
-                    start_index, stop_index)
+                normalized_query = self.normalize_ctx(ctx.select_statement())
             else:
-                inner_query_text = "<UNKNOWN_QUERY>"
-
-            normalized_query = normalize_sql(inner_query_text)
+                normalized_query = "<UNKNOWN_QUERY>"
 
             # ✅ Create or reuse WITH_CTE block
             if not hasattr(self, 'current_ctes_block'):
@@ -1156,6 +1405,8 @@ class ASTBuilder(TSqlParserListener):
                 "statements": []
             }
 
+            self.symbols = {}
+
             # Push to stack
             self.proc_stack.append(self.current_proc)
             self.statement_stack.append(self.current_proc["statements"])
@@ -1180,7 +1431,7 @@ class ASTBuilder(TSqlParserListener):
                             # ✅ Fallback: parse fetch vars from full SQL text if nothing found
                             loop["fetch_into"] = ["<UNKNOWN_VAR>"]
 
-            self.ast.append(proc_obj)
+            self._add_top_level(proc_obj)
 
         except Exception as e:
             print(f"❌ Error exiting CREATE PROCEDURE: {e}")
@@ -1195,8 +1446,8 @@ class ASTBuilder(TSqlParserListener):
                 ctx, "LOCAL_ID") and ctx.LOCAL_ID() else None
             if not name:
                 # Fallback: grab first '@...' token from the text span
-                raw = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-                m = re.search(r"@\w+", raw)
+                raw = self.source_text(ctx)
+                m = VARIABLE_RE.search(raw)
                 name = m.group(0) if m else "<UNKNOWN_PARAM>"
 
             # Data type (keep full precision/length)
@@ -1207,11 +1458,13 @@ class ASTBuilder(TSqlParserListener):
             if hasattr(ctx, "output_clause") and ctx.output_clause():
                 mode = "OUT"
 
-            self.current_proc["params"].append({
+            param = {
                 "name": name,
                 "type": dtype,
                 "mode": mode
-            })
+            }
+            self.current_proc["params"].append(param)
+            self._declare_symbol(param, "param")
 
         except Exception as e:
             print(f"❌ Error in enterProcedure_param: {e}")
@@ -1230,8 +1483,8 @@ class ASTBuilder(TSqlParserListener):
                 var_name = ctx.LOCAL_ID().getText()
             else:
                 # Fallback from raw text
-                raw = ctx.start.getInputStream().getText(ctx.start.start, ctx.stop.stop)
-                m = re.search(r"@\w+", raw)
+                raw = self.source_text(ctx)
+                m = VARIABLE_RE.search(raw)
                 var_name = m.group(0) if m else "<UNKNOWN_VAR>"
 
             # Type
@@ -1250,6 +1503,7 @@ class ASTBuilder(TSqlParserListener):
                 var_obj["default"] = default_value
 
             self.current_proc["variables"].append(var_obj)
+            self._declare_symbol(var_obj, "variable")
 
         except Exception as e:
             print(f"❌ Error in enterDeclareVariable: {e}")
@@ -0,0 +1,176 @@
+"""Parse tree walker specialized for ASTBuilder-style listeners.
+
+ParseTreeWalker calls enterEveryRule/exitEveryRule and the rule-specific
+enterX/exitX on every node, although ASTBuilder only overrides a few
+dozen of the hundreds of TSqlParserListener hooks. ASTWalker works out,
+once per listener class and context class, which hooks are really
+overridden, and skips subtrees whose grammar rule cannot reach any rule
+with a hook (e.g. most expression subtrees).
+"""
+from antlr4 import ParserRuleContext, ParseTreeListener
+from antlr4.atn.Transition import RuleTransition
+from antlr4.tree.Tree import ErrorNode, ParseTreeWalker, TerminalNode
+from TSqlParser import TSqlParser
+from TSqlParserListener import TSqlParserListener
+
+_rule_calls = None
+
+
+def rule_calls():
+    """rule index -> set of rule indexes it invokes directly (from the ATN)."""
+    global _rule_calls
+    if _rule_calls is not None:
+        return _rule_calls
+
+    calls = []
+    atn = TSqlParser.atn
+    for rule, start in enumerate(atn.ruleToStartState):
+        # Stop at the rule's end: the transitions out of its stop state
+        # lead back into every caller's follow state
+        stop = atn.ruleToStopState[rule]
+        callees = set()
+        seen = {start.stateNumber}
+        pending = [start]
+        while pending:
+            state = pending.pop()
+            if state is stop:
+                continue
+            for t in state.transitions:
+                if isinstance(t, RuleTransition):
+                    callees.add(t.ruleIndex)
+                    nxt = t.followState
+                else:
+                    nxt = t.target
+                if nxt.stateNumber not in seen:
+                    seen.add(nxt.stateNumber)
+                    pending.append(nxt)
+        calls.append(callees)
+    _rule_calls = calls
+    return calls
+
+
+def rules_reaching(targets):
+    """Rules whose subtrees can contain a node of one of `targets`."""
+    callers = {}
+    for rule, callees in enumerate(rule_calls()):
+        for callee in callees:
+            callers.setdefault(callee, []).append(rule)
+    found = set()
+    pending = list(targets)
+    while pending:
+        for caller in callers.get(pending.pop(), ()):
+            if caller not in found:
+                found.add(caller)
+                pending.append(caller)
+    return found
+
+
+def _overrides(listener_class, name, base=TSqlParserListener):
+    impl = getattr(listener_class, name, None)
+    return impl is not None and impl is not getattr(base, name, None)
+
+
+# Context classes missing from the plan: visit every hook-less child
+_UNPLANNED = (None, None, True)
+
+
+class ASTWalker(ParseTreeWalker):
+    """Walks a TSqlParser tree calling only the hooks a listener overrides.
+
+    Hooks fire in the same order as with ParseTreeWalker. Listeners that
+    override enterEveryRule/exitEveryRule get a plain full walk. Neither
+    walk recurses, so arbitrarily deep trees don't hit the recursion limit.
+    """
+
+    def __init__(self):
+        # listener class -> {context class: (enter, exit, descend)}
+        self._plans = {}
+
+    def _plan(self, listener_class):
+        plan = self._plans.get(listener_class)
+        if plan is not None:
+            return plan
+
+        hooks = {}
+        hooked_rules = set()
+        for name, ctx_class in vars(TSqlParser).items():
+            if not (isinstance(ctx_class, type) and issubclass(ctx_class, ParserRuleContext)):
+                continue
+            if "enterRule" not in vars(ctx_class):
+                continue  # base class of labeled alternatives, never instantiated
+            rule = name[:-len("Context")]
+            enter = getattr(listener_class, "enter" + rule) if _overrides(listener_class, "enter" + rule) else None
+            exit_ = getattr(listener_class, "exit" + rule) if _overrides(listener_class, "exit" + rule) else None
+            hooks[ctx_class] = (enter, exit_)
+            if enter or exit_:
+                hooked_rules.add(ctx_class.getRuleIndex(None))
+
+        descend_rules = rules_reaching(hooked_rules)
+        plan = {}
+        for ctx_class, (enter, exit_) in hooks.items():
+            descend = ctx_class.getRuleIndex(None) in descend_rules
+            plan[ctx_class] = (enter, exit_, descend)
+        self._plans[listener_class] = plan
+        return plan
+
+    def walk(self, listener, t):
+        listener_class = type(listener)
+        if (_overrides(listener_class, "enterEveryRule", ParseTreeListener)
+                or _overrides(listener_class, "exitEveryRule", ParseTreeListener)):
+            return self._walk_all(listener, t)
+        visit_terminals = (_overrides(listener_class, "visitTerminal", ParseTreeListener)
+                           or _overrides(listener_class, "visitErrorNode", ParseTreeListener))
+        self._walk(listener, t, self._plan(listener_class), visit_terminals)
+
+    # Both walks use an explicit stack instead of recursion, so nesting
+    # depth is bounded by memory rather than by the recursion limit. An
+    # exit is pushed as a (hook, node) tuple underneath the node's children.
+
+    def _walk(self, listener, root, plan, visit_terminals):
+        stack = [root]
+        pop = stack.pop
+        while stack:
+            t = pop()
+            if type(t) is tuple:
+                t[0](listener, t[1])
+                continue
+            if isinstance(t, TerminalNode):
+                if visit_terminals:
+                    if isinstance(t, ErrorNode):
+                        listener.visitErrorNode(t)
+                    else:
+                        listener.visitTerminal(t)
+                continue
+
+            enter, exit_, descend = plan.get(type(t), _UNPLANNED)
+            if enter:
+                enter(listener, t)
+            if exit_:
+                stack.append((exit_, t))
+            if (descend or visit_terminals) and t.children:
+                stack.extend(reversed(t.children))
+
+    def _walk_all(self, listener, root):
+        # Same hook sequence as ParseTreeWalker.walk
+        stack = [root]
+        pop = stack.pop
+        while stack:
+            t = pop()
+            if type(t) is tuple:
+                t[1].exitRule(listener)
+                listener.exitEveryRule(t[1])
+                continue
+            if isinstance(t, ErrorNode):
+                listener.visitErrorNode(t)
+                continue
+            if isinstance(t, TerminalNode):
+                listener.visitTerminal(t)
+                continue
+            listener.enterEveryRule(t)
+            t.enterRule(listener)
+            stack.append((None, t))
+            if t.children:
+                stack.extend(reversed(t.children))
+
+
+ASTWalker.DEFAULT = ASTWalker()
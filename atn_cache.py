@@ -0,0 +1,178 @@
+"""Opt-in on-disk cache of warmed TSqlLexer/TSqlParser prediction DFAs.
+
+ANTLR builds its prediction DFAs lazily, so every new process starts
+cold and the first file parses several times slower than the next one.
+This module snapshots the accumulated `decisionsToDFA` of the lexer and
+parser after a warm-up run and restores it on startup.
+
+ATN states are written as references (state number) into the ATN that
+the generated modules deserialize at import time, so the snapshot stays
+small and is only ever restored against the grammar it was built from.
+
+Usage:
+    python atn_cache.py --warmup input --cache .atn_cache.pkl
+    python parser.py --atn-cache .atn_cache.pkl ...
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+
+import antlr4
+from antlr4.atn.ATNSimulator import ATNSimulator
+from antlr4.atn.ATNState import ATNState
+from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+from antlr4.atn.SemanticContext import SemanticContext
+from antlr4.PredictionContext import PredictionContext
+import TSqlLexer as lexer_module
+import TSqlParser as parser_module
+from TSqlLexer import TSqlLexer
+from TSqlParser import TSqlParser
+
+DEFAULT_CACHE_PATH = ".atn_cache.pkl"
+
+# DFA graphs are deeply linked; (un)pickling them recurses once per edge
+_RECURSION_LIMIT = 1000000
+_STACK_SIZE = 512 * 1024 * 1024
+
+# Runtime singletons compared by identity (`is`) inside the ATN simulators
+_SINGLETONS = {
+    "semantic_none": SemanticContext.NONE,
+    "context_empty": PredictionContext.EMPTY,
+    "parser_error": ATNSimulator.ERROR,
+    "lexer_error": LexerATNSimulator.ERROR,
+}
+
+_RECOGNIZERS = {"lexer": TSqlLexer, "parser": TSqlParser}
+
+
+def grammar_key():
+    """Fingerprint of the generated grammar and the ANTLR runtime."""
+    h = hashlib.sha256()
+    h.update(str(lexer_module.serializedATN()).encode())
+    h.update(str(parser_module.serializedATN()).encode())
+    h.update(getattr(antlr4, "__version__", "").encode())
+    return h.hexdigest()
+
+
+class _DFAPickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        if isinstance(obj, ATNState):
+            which = "lexer" if obj.atn is TSqlLexer.atn else "parser"
+            return ("atn_state", which, obj.stateNumber)
+        for name, singleton in _SINGLETONS.items():
+            if obj is singleton:
+                return ("singleton", name)
+        return None
+
+
+class _DFAUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid[0] == "atn_state":
+            return _RECOGNIZERS[pid[1]].atn.states[pid[2]]
+        if pid[0] == "singleton":
+            return _SINGLETONS[pid[1]]
+        raise pickle.UnpicklingError(f"Unknown persistent id: {pid}")
+
+
+def _run_deep(func, *args):
+    # Run func on a thread with a large stack so deep DFA graphs don't
+    # overflow the C stack while (un)pickling
+    result = {}
+
+    def target():
+        old_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(_RECURSION_LIMIT)
+        try:
+            result["value"] = func(*args)
+        except BaseException as e:
+            result["error"] = e
+        finally:
+            sys.setrecursionlimit(old_limit)
+
+    old_size = threading.stack_size(_STACK_SIZE)
+    try:
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(old_size)
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def save_atn_cache(path=DEFAULT_CACHE_PATH):
+    snapshot = {
+        "key": grammar_key(),
+        "lexer": TSqlLexer.decisionsToDFA,
+        "parser": TSqlParser.decisionsToDFA,
+    }
+
+    def dump():
+        with open(path, "wb") as f:
+            _DFAPickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(snapshot)
+
+    _run_deep(dump)
+
+
+def load_atn_cache(path=DEFAULT_CACHE_PATH):
+    """Restore warmed DFAs from `path`. Returns True if the cache was used."""
+    if not path or not os.path.exists(path):
+        return False
+
+    def load():
+        with open(path, "rb") as f:
+            return _DFAUnpickler(f).load()
+
+    try:
+        snapshot = _run_deep(load)
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable ATN cache {path}: {e}")
+        return False
+    if snapshot.get("key") != grammar_key():
+        print(f"⚠️ Ignoring stale ATN cache {path} (grammar or runtime changed)")
+        return False
+
+    TSqlLexer.decisionsToDFA = snapshot["lexer"]
+    TSqlParser.decisionsToDFA = snapshot["parser"]
+    return True
+
+
+def dfa_state_count():
+    return sum(len(dfa.states) for dfa in TSqlLexer.decisionsToDFA + TSqlParser.decisionsToDFA)
+
+
+def warm_up(pattern, path=DEFAULT_CACHE_PATH, prediction="sll"):
+    """Parse every file matching `pattern` and save the warmed DFAs."""
+    import io
+    from contextlib import redirect_stdout
+    from parser import find_sql_files, parse_file
+
+    load_atn_cache(path)
+    for input_file in find_sql_files(pattern):
+        try:
+            with redirect_stdout(io.StringIO()):
+                parse_file(input_file, prediction)
+        except Exception as e:
+            print(f"❌ Warm-up failed on {input_file}: {e}")
+    save_atn_cache(path)
+    print(f"✅ Saved {dfa_state_count()} DFA state(s) to: {path}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Build or inspect the on-disk ATN/DFA cache")
+    arg_parser.add_argument("--warmup", default="input",
+                            help="Directory or glob of .sql files to warm up on")
+    arg_parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                            help="Cache file to write")
+    arg_parser.add_argument("--prediction", choices=["sll", "ll"], default="sll")
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    warm_up(args.warmup, args.cache, args.prediction)
+    print(f"   Warm-up took {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,237 @@
+"""Parser benchmark over input/ (and optionally synthetic procedures).
+
+Every file is parsed in a fresh Python process, so the numbers include
+ANTLR's DFA warm-up the way a CLI run sees it:
+
+    cold_seconds   first parse_file() in the process
+    seconds        best of `--repeat` further parses (warm DFAs)
+    lines_per_s / procs_per_s   from `seconds`
+    peak_rss_kb    peak resident set size of that process
+
+Results are written as JSON; with --baseline they are compared against an
+earlier run and the exit code is 1 if any file got slower (or bigger) by
+more than --threshold.
+
+Usage:
+    python benchmark.py --input input --output bench.json
+    python benchmark.py --scale 10000 50000 --baseline bench.json
+    python benchmark.py --compare new.json --baseline bench.json --threshold 0.2
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+
+# Deeply nested synthetic procedures need a deep parser stack
+_RECURSION_LIMIT = 100000
+_STACK_SIZE = 512 * 1024 * 1024
+
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def count_lines(path):
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def measure(input_file, repeat=3, atn_cache=None, prediction="sll"):
+    """Parse `input_file` 1 + `repeat` times in this process and return its record."""
+    from parser import load_lexer, load_parser, parse_file
+    if atn_cache:
+        from atn_cache import load_atn_cache
+        load_atn_cache(atn_cache)
+
+    # The grammar is imported lazily; import it now so that rss_after_import_kb
+    # includes it and cold_seconds measures the first parse, not the import
+    load_lexer()
+    load_parser()
+    rss_before = _peak_rss_kb()
+    runs = []
+    for _ in range(1 + repeat):
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            ast = parse_file(input_file, prediction)
+        runs.append(time.perf_counter() - started)
+
+    lines = count_lines(input_file)
+    procs = sum(1 for node in ast if "proc_name" in node)
+    best = min(runs[1:]) if repeat else runs[0]
+    return {
+        "file": input_file,
+        "lines": lines,
+        "procs": procs,
+        "nodes": len(ast),
+        "cold_seconds": runs[0],
+        "seconds": best,
+        "lines_per_s": lines / best if best else None,
+        "procs_per_s": procs / best if best else None,
+        "rss_after_import_kb": rss_before,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def _measure_in_thread(*args):
+    result = {}
+
+    def target():
+        sys.setrecursionlimit(_RECURSION_LIMIT)
+        try:
+            result["value"] = measure(*args)
+        except BaseException as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+
+    threading.stack_size(_STACK_SIZE)
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    return result.get("value") or {"file": args[0], "error": result["error"]}
+
+
+def run_one(input_file, repeat, atn_cache, prediction):
+    """Measure `input_file` in a fresh interpreter."""
+    cmd = [sys.executable, os.path.abspath(__file__), "--measure", input_file,
+           "--repeat", str(repeat), "--prediction", prediction]
+    if atn_cache:
+        cmd += ["--atn-cache", atn_cache]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"file": input_file, "error": (proc.stderr.strip().splitlines() or ["no output"])[-1]}
+    return json.loads(lines[-1])
+
+
+def run_benchmark(files, repeat=3, atn_cache=None, prediction="sll"):
+    results = []
+    for input_file in files:
+        record = run_one(input_file, repeat, atn_cache, prediction)
+        results.append(record)
+        if "error" in record:
+            print(f"❌ {input_file}: {record['error']}")
+        else:
+            print(f"✅ {input_file}: {record['lines']} lines, "
+                  f"{record['lines_per_s']:.0f} lines/s warm, "
+                  f"{record['cold_seconds']:.2f}s cold, peak RSS {record['peak_rss_kb']} KB")
+
+    ok = [r for r in results if "error" not in r]
+    seconds = sum(r["seconds"] for r in ok)
+    totals = {
+        "files": len(results),
+        "failed": len(results) - len(ok),
+        "lines": sum(r["lines"] for r in ok),
+        "procs": sum(r["procs"] for r in ok),
+        "seconds": seconds,
+        "cold_seconds": sum(r["cold_seconds"] for r in ok),
+    }
+    totals["lines_per_s"] = totals["lines"] / seconds if seconds else None
+    totals["procs_per_s"] = totals["procs"] / seconds if seconds else None
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "atn_cache": bool(atn_cache),
+        "prediction": prediction,
+        "totals": totals,
+        "files": results,
+    }
+
+
+# metric -> True if higher is better
+_COMPARED = {"lines_per_s": True, "cold_seconds": False, "peak_rss_kb": False}
+
+
+def compare(results, baseline, threshold=0.10):
+    """Regressions of `results` against `baseline` beyond `threshold` (a fraction)."""
+    before = {os.path.basename(r["file"]): r for r in baseline["files"] if "error" not in r}
+    regressions = []
+    for record in results["files"]:
+        old = before.get(os.path.basename(record["file"]))
+        if old is None or "error" in record:
+            continue
+        for metric, higher_is_better in _COMPARED.items():
+            new_value, old_value = record.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append({
+                    "file": record["file"], "metric": metric,
+                    "baseline": old_value, "current": new_value, "change": change,
+                })
+    return regressions
+
+
+def find_inputs(pattern, scale, shapes, synthetic_dir):
+    from parser import find_sql_files
+    files = find_sql_files(pattern) if pattern else []
+    if scale:
+        from synth_sql import generate
+        for shape in shapes:
+            for lines in scale:
+                files.append(generate(shape, lines, synthetic_dir))
+    return files
+
+
+if __name__ == "__main__":
+    from synth_sql import SHAPES
+
+    arg_parser = argparse.ArgumentParser(description="Benchmark the Sybase SQL parser")
+    arg_parser.add_argument("--input", default="input", help="Directory or glob of .sql files ('' for none)")
+    arg_parser.add_argument("--scale", type=int, nargs="*", default=[],
+                            help="Also benchmark synthetic procedures of these line counts (see synth_sql.py)")
+    arg_parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES))
+    arg_parser.add_argument("--synthetic-dir", help="Keep generated procedures here (default: a temp dir)")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Warm parses per file after the cold one")
+    arg_parser.add_argument("--atn-cache", help="Restore warmed DFAs in every measured process")
+    arg_parser.add_argument("--prediction", choices=["sll", "ll"], default="sll")
+    arg_parser.add_argument("--output", default="bench.json", help="Where to write the results")
+    arg_parser.add_argument("--baseline", help="Earlier results to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.10,
+                            help="Allowed relative regression per metric (default 0.10 = 10%%)")
+    arg_parser.add_argument("--compare", help="Compare this results file with --baseline instead of running")
+    arg_parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.measure:
+        # Child process of run_one(): print one JSON record
+        print(json.dumps(_measure_in_thread(args.measure, args.repeat, args.atn_cache, args.prediction)))
+        sys.exit(0)
+
+    if args.compare:
+        with open(args.compare) as f:
+            results = json.load(f)
+    else:
+        synthetic_dir = args.synthetic_dir or tempfile.mkdtemp(prefix="synth_sql_")
+        files = find_inputs(args.input, args.scale, args.shapes, synthetic_dir)
+        results = run_benchmark(files, args.repeat, args.atn_cache, args.prediction)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        totals = results["totals"]
+        print(f"\n✅ {totals['files'] - totals['failed']}/{totals['files']} file(s), "
+              f"{totals['lines']} lines in {totals['seconds']:.2f}s warm "
+              f"({totals['cold_seconds']:.2f}s cold); results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print(f"❌ {r['file']}: {r['metric']} {r['baseline']:.4g} -> {r['current']:.4g} "
+                  f"({r['change']:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%} against: {args.baseline}")
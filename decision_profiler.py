@@ -0,0 +1,225 @@
+"""Grammar decision profiling for TSqlParser (parser.py --profile-decisions).
+
+The Python ANTLR runtime has no ProfilingATNSimulator/ParseInfo, so this
+module ports the parts of it we need: ProfilingATNSimulator replaces the
+parser's ATN simulator and, for every grammar decision, records
+
+    invocations, time        adaptivePredict() calls and the time they took
+    sll_*_look               lookahead depth (tokens) of SLL prediction
+    ll_fallbacks, ll_*_look  full-context (LL) retries and their lookahead
+    ambiguities              exact ambiguities found by full-context prediction
+    context_sensitivities    LL predicted something other than SLL would have
+    errors                   decisions without a viable alternative
+    dfa_hits, atn_steps      lookahead steps served by the cached DFA vs.
+                             computed by ATN simulation (the expensive part)
+
+Decisions are mapped to their grammar rule, and the input location
+(file:line) of the deepest lookahead, of LL fallbacks and of ambiguities is
+kept. Note that with --prediction sll (the default) SLL-only parses never
+try full context, so run with --prediction ll to see LL fallbacks and
+ambiguities for every decision.
+"""
+import json
+import time
+
+from antlr4.atn.ATNSimulator import ATNSimulator
+from antlr4.atn.ParserATNSimulator import ParserATNSimulator
+
+PROFILER = None
+
+# Input locations kept per decision and kind of event
+MAX_LOCATIONS = 10
+
+
+def enable():
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = DecisionProfiler()
+    return PROFILER
+
+
+def _new_decision():
+    return {
+        "invocations": 0, "time": 0.0,
+        "sll_total_look": 0, "sll_max_look": 0,
+        "ll_fallbacks": 0, "ll_total_look": 0, "ll_max_look": 0,
+        "ambiguities": 0, "context_sensitivities": 0, "errors": 0,
+        "dfa_hits": 0, "atn_steps": 0,
+        "max_look_at": None, "fallbacks_at": [], "ambiguities_at": [],
+    }
+
+
+def _location(stream, index):
+    if not 0 <= index < len(stream.tokens):
+        return None
+    token = stream.tokens[index]
+    source = token.getInputStream()
+    return f"{getattr(source, 'fileName', '<input>')}:{token.line}"
+
+
+def _alts(configs):
+    return {c.alt for c in configs}
+
+
+def _short(locations, shown=3):
+    if not locations:
+        return "-"
+    more = f" (+{len(locations) - shown} more)" if len(locations) > shown else ""
+    return ", ".join(locations[:shown]) + more
+
+
+def _remember(locations, where):
+    if where and where not in locations and len(locations) < MAX_LOCATIONS:
+        locations.append(where)
+
+
+class ProfilingATNSimulator(ParserATNSimulator):
+    def __init__(self, parser, profiler):
+        super().__init__(parser, parser.atn, parser.decisionsToDFA, parser.sharedContextCache)
+        self.profiler = profiler
+        self._sll_stop = -1
+        self._ll_stop = -1
+        self._decision = None
+        self._sll_alt = None
+
+    def adaptivePredict(self, input, decision, outerContext):
+        stats = self.profiler.decision(decision)
+        self._sll_stop = -1
+        self._ll_stop = -1
+        self._decision = stats
+        started = time.perf_counter()
+        try:
+            return super().adaptivePredict(input, decision, outerContext)
+        finally:
+            stats["time"] += time.perf_counter() - started
+            stats["invocations"] += 1
+            start = self._startIndex
+            sll_k = self._sll_stop - start + 1
+            stats["sll_total_look"] += sll_k
+            if sll_k > stats["sll_max_look"]:
+                stats["sll_max_look"] = sll_k
+                stats["max_look_at"] = _location(input, start)
+            if self._ll_stop >= 0:
+                ll_k = self._ll_stop - start + 1
+                stats["ll_total_look"] += ll_k
+                stats["ll_max_look"] = max(stats["ll_max_look"], ll_k)
+
+    def getExistingTargetState(self, previousD, t):
+        self._sll_stop = self._input.index
+        state = super().getExistingTargetState(previousD, t)
+        if state is not None:
+            self._decision["dfa_hits"] += 1
+            if state is ATNSimulator.ERROR:
+                self._decision["errors"] += 1
+        return state
+
+    def computeReachSet(self, closure, t, fullCtx):
+        if fullCtx:
+            self._ll_stop = self._input.index
+        reach = super().computeReachSet(closure, t, fullCtx)
+        self._decision["atn_steps"] += 1
+        if reach is None:
+            self._decision["errors"] += 1
+        return reach
+
+    def reportAttemptingFullContext(self, dfa, conflictingAlts, configs, startIndex, stopIndex):
+        alts = conflictingAlts if conflictingAlts is not None else _alts(configs)
+        self._sll_alt = min(alts)
+        self._decision["ll_fallbacks"] += 1
+        _remember(self._decision["fallbacks_at"], _location(self._input, startIndex))
+        super().reportAttemptingFullContext(dfa, conflictingAlts, configs, startIndex, stopIndex)
+
+    def reportContextSensitivity(self, dfa, prediction, configs, startIndex, stopIndex):
+        if prediction != self._sll_alt:
+            self._decision["context_sensitivities"] += 1
+        super().reportContextSensitivity(dfa, prediction, configs, startIndex, stopIndex)
+
+    def reportAmbiguity(self, dfa, D, startIndex, stopIndex, exact, ambigAlts, configs):
+        self._decision["ambiguities"] += 1
+        _remember(self._decision["ambiguities_at"], _location(self._input, startIndex))
+        prediction = min(ambigAlts) if ambigAlts else min(_alts(configs))
+        if configs.fullCtx and prediction != self._sll_alt:
+            self._decision["context_sensitivities"] += 1
+        super().reportAmbiguity(dfa, D, startIndex, stopIndex, exact, ambigAlts, configs)
+
+
+class DecisionProfiler:
+    def __init__(self):
+        self.decisions = {}  # decision number -> stats
+
+    def decision(self, number):
+        stats = self.decisions.get(number)
+        if stats is None:
+            stats = self.decisions[number] = _new_decision()
+        return stats
+
+    def attach(self, parser):
+        """Make `parser` predict through a ProfilingATNSimulator."""
+        parser._interp = ProfilingATNSimulator(parser, self)
+        return parser
+
+    def merge(self, decisions):
+        # Stats gathered in pool workers
+        for number, other in decisions.items():
+            stats = self.decision(int(number))
+            for key, value in other.items():
+                if key.endswith("_max_look"):
+                    stats[key] = max(stats[key], value)
+                elif key == "max_look_at":
+                    if other["sll_max_look"] >= stats["sll_max_look"]:
+                        stats[key] = value
+                elif key.endswith("_at"):
+                    for where in value:
+                        _remember(stats[key], where)
+                else:
+                    stats[key] += value
+
+    def rows(self):
+        """One row per decision, slowest first."""
+        from TSqlParser import TSqlParser
+        rows = []
+        for number, stats in self.decisions.items():
+            state = TSqlParser.atn.decisionToState[number]
+            row = {"decision": number, "rule": TSqlParser.ruleNames[state.ruleIndex],
+                   "atn_state": state.stateNumber}
+            row.update(stats)
+            calls = stats["invocations"] or 1
+            row["sll_avg_look"] = stats["sll_total_look"] / calls
+            rows.append(row)
+        rows.sort(key=lambda r: r["time"], reverse=True)
+        return rows
+
+    def rule_rows(self):
+        """Decision stats summed per grammar rule, slowest first."""
+        rules = {}
+        for row in self.rows():
+            r = rules.setdefault(row["rule"], {
+                "rule": row["rule"], "decisions": 0, "invocations": 0, "time": 0.0,
+                "sll_max_look": 0, "ll_fallbacks": 0, "ambiguities": 0,
+                "context_sensitivities": 0, "atn_steps": 0})
+            r["decisions"] += 1
+            for key in ("invocations", "time", "ll_fallbacks", "ambiguities",
+                        "context_sensitivities", "atn_steps"):
+                r[key] += row[key]
+            r["sll_max_look"] = max(r["sll_max_look"], row["sll_max_look"])
+        return sorted(rules.values(), key=lambda r: r["time"], reverse=True)
+
+    def report(self):
+        return {"rules": self.rule_rows(), "decisions": self.rows()}
+
+    def print_table(self, limit=25):
+        print(f"\n{'decision':>8} {'rule':<32} {'calls':>8} {'time s':>9} {'SLL max':>8} "
+              f"{'LL fb':>6} {'ambig':>6} {'ATN':>7}  deepest lookahead at")
+        for r in self.rows()[:limit]:
+            print(f"{r['decision']:>8} {r['rule']:<32} {r['invocations']:>8} {r['time']:>9.4f} "
+                  f"{r['sll_max_look']:>8} {r['ll_fallbacks']:>6} {r['ambiguities']:>6} "
+                  f"{r['atn_steps']:>7}  {r['max_look_at'] or ''}")
+        for r in self.rows()[:limit]:
+            if r["fallbacks_at"] or r["ambiguities_at"]:
+                print(f"   decision {r['decision']} ({r['rule']}): "
+                      f"LL fallback at {_short(r['fallbacks_at'])}; "
+                      f"ambiguous at {_short(r['ambiguities_at'])}")
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
@@ -0,0 +1,128 @@
+"""Opt-in profiler for ASTBuilder callbacks (parser.py --profile-hooks).
+
+enable() builds a subclass of ASTBuilder in which every method ASTBuilder
+defines (its enter*/exit* hooks and helpers such as _append_statement or
+_ensure_variable_exists) is wrapped with a call counter and timer, and
+patches the module-level normalize_sql / normalize_tokens the same way.
+parse_batch() instantiates that subclass instead of ASTBuilder, so while
+profiling is disabled nothing is wrapped and nothing is measured.
+
+For every callback the profiler keeps its call count, total (inclusive)
+time and own time, i.e. without the time spent in profiled calls it made.
+The calls and hits of ast_listener's heuristic regexes (ast_listener.PATTERNS)
+are reported alongside.
+"""
+import functools
+import json
+import time
+
+# Module-level helpers of ast_listener that ASTBuilder calls by name
+MODULE_HELPERS = ("normalize_sql", "normalize_tokens")
+
+PROFILER = None
+
+
+def enable():
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = HookProfiler()
+    return PROFILER
+
+
+class HookProfiler:
+    def __init__(self, builder_class=None):
+        # Imported here so that parser.py can import this module without
+        # importing the grammar (see parser.load_parser)
+        import ast_listener
+        builder_class = builder_class or ast_listener.ASTBuilder
+        self.stats = {}  # name -> [calls, total seconds, own seconds]
+        self.patterns = {}  # regex name -> {"calls": n, "hits": n}
+        self._nested = []  # time spent in profiled callees, per open call
+        methods = {}
+        for name, value in vars(builder_class).items():
+            if callable(value) and name != "__init__":
+                methods[name] = self._wrap(name, value)
+        self.builder_class = type("Profiled" + builder_class.__name__, (builder_class,), methods)
+        for name in MODULE_HELPERS:
+            func = getattr(ast_listener, name)
+            if not hasattr(func, "__wrapped__"):
+                setattr(ast_listener, name, self._wrap(name, func))
+
+    def _wrap(self, name, func):
+        stats = self.stats.setdefault(name, [0, 0.0, 0.0])
+        nested = self._nested
+        clock = time.perf_counter
+
+        @functools.wraps(func)
+        def profiled(*args, **kwargs):
+            started = clock()
+            nested.append(0.0)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - started
+                inner = nested.pop()
+                if nested:
+                    nested[-1] += elapsed
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] += elapsed - inner
+        return profiled
+
+    def snapshot(self, reset=False):
+        stats = {name: list(s) for name, s in self.stats.items() if s[0]}
+        if reset:
+            for s in self.stats.values():
+                s[:] = [0, 0.0, 0.0]  # in place: the wrappers hold these lists
+        from ast_listener import pattern_stats
+        return {"callbacks": stats, "patterns": pattern_stats(reset)}
+
+    def merge(self, snapshot):
+        # Stats gathered in pool workers
+        for name, (calls, total, own) in snapshot["callbacks"].items():
+            s = self.stats.setdefault(name, [0, 0.0, 0.0])
+            s[0] += calls
+            s[1] += total
+            s[2] += own
+        for name, counts in snapshot["patterns"].items():
+            p = self.patterns.setdefault(name, {"calls": 0, "hits": 0})
+            p["calls"] += counts["calls"]
+            p["hits"] += counts["hits"]
+
+    def pattern_rows(self):
+        """Heuristic regexes used in this process or merged from workers, most called first."""
+        from ast_listener import pattern_stats
+        counts = {name: dict(c) for name, c in self.patterns.items()}
+        for name, c in pattern_stats().items():
+            p = counts.setdefault(name, {"calls": 0, "hits": 0})
+            p["calls"] += c["calls"]
+            p["hits"] += c["hits"]
+        rows = [{"pattern": name, "calls": c["calls"], "hits": c["hits"],
+                 "hit_rate": c["hits"] / c["calls"]}
+                for name, c in counts.items() if c["calls"]]
+        rows.sort(key=lambda r: r["calls"], reverse=True)
+        return rows
+
+    def rows(self):
+        """Called callbacks, slowest own time first."""
+        rows = [
+            {"callback": name, "calls": calls, "total_seconds": total,
+             "own_seconds": own, "own_per_call_us": own / calls * 1e6}
+            for name, (calls, total, own) in self.stats.items() if calls
+        ]
+        rows.sort(key=lambda r: r["own_seconds"], reverse=True)
+        return rows
+
+    def print_table(self, limit=None):
+        rows = self.rows()[:limit]
+        print(f"\n{'callback':<40} {'calls':>9} {'total s':>10} {'own s':>10} {'own µs/call':>12}")
+        for r in rows:
+            print(f"{r['callback']:<40} {r['calls']:>9} {r['total_seconds']:>10.4f} "
+                  f"{r['own_seconds']:>10.4f} {r['own_per_call_us']:>12.1f}")
+        print(f"\n{'pattern':<40} {'calls':>9} {'hits':>9} {'hit %':>7}")
+        for r in self.pattern_rows()[:limit]:
+            print(f"{r['pattern']:<40} {r['calls']:>9} {r['hits']:>9} {r['hit_rate']:>7.1%}")
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump({"callbacks": self.rows(), "patterns": self.pattern_rows()}, f, indent=2)
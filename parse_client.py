@@ -0,0 +1,105 @@
+"""Thin client for parse_daemon.py.
+
+Sends a .sql file (or stdin) to a running daemon and prints or saves the
+AST JSON. Only the standard library is imported, so a request costs little
+more than interpreter startup.
+
+Usage:
+    python parse_client.py input/sample_5.sql
+    python parse_client.py input/sample_5.sql --output output/ast_sample_5.json
+    cat proc.sql | python parse_client.py - --socket /tmp/sybase_parser.sock
+    python parse_client.py --health
+    python parse_client.py --shutdown
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+from urllib.parse import quote
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+TOKEN_HEADER = "X-Parse-Daemon-Token"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(method, path, body=None, host=DEFAULT_HOST, port=DEFAULT_PORT,
+            socket_path=None, timeout=300, token=None):
+    """Send one request to the daemon and return (HTTP status, JSON body)."""
+    if socket_path:
+        conn = UnixHTTPConnection(socket_path, timeout)
+    else:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        headers = {"Content-Type": "text/plain; charset=utf-8"} if body is not None else {}
+        if token:
+            headers[TOKEN_HEADER] = token
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        conn.close()
+
+
+def parse(sql_text, name="<input>", **server):
+    """AST nodes of `sql_text`, parsed by the daemon."""
+    status, reply = request("POST", f"/parse?name={quote(name)}", sql_text.encode("utf-8"), **server)
+    if status != 200:
+        raise RuntimeError(reply.get("error", f"HTTP {status}"))
+    return reply
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parse Sybase SQL through a running parse_daemon.py")
+    arg_parser.add_argument("input", nargs="?", help="Path to a .sql file, or - for stdin")
+    arg_parser.add_argument("--output", help="Save the AST JSON here (default: print it)")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST)
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument("--socket", help="Unix domain socket of the daemon (instead of --host/--port)")
+    arg_parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for the daemon")
+    arg_parser.add_argument("--health", action="store_true", help="Print the daemon's status")
+    arg_parser.add_argument("--shutdown", action="store_true", help="Stop the daemon")
+    arg_parser.add_argument("--token", default=os.environ.get("PARSE_DAEMON_TOKEN"),
+                            help="The daemon's --token, needed by --shutdown (default: $PARSE_DAEMON_TOKEN)")
+    args = arg_parser.parse_args()
+    server = {"host": args.host, "port": args.port, "socket_path": args.socket, "timeout": args.timeout,
+              "token": args.token}
+
+    try:
+        if args.health or args.shutdown:
+            path = "/health" if args.health else "/shutdown"
+            status, reply = request("GET" if args.health else "POST", path, **server)
+            print(json.dumps(reply, indent=2))
+            sys.exit(0 if status == 200 else 1)
+        if not args.input:
+            arg_parser.error("an input file (or -) is required")
+
+        if args.input == "-":
+            name, sql_text = "<stdin>", sys.stdin.read()
+        else:
+            name = args.input
+            with open(args.input, encoding="utf-8") as f:
+                sql_text = f.read()
+        reply = parse(sql_text, os.path.basename(name), **server)
+    except (OSError, RuntimeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reply["ast"], f, indent=2)
+        print(f"✅ AST saved to: {args.output} ({reply['seconds'] * 1000:.0f} ms)", file=sys.stderr)
+    else:
+        print(json.dumps(reply["ast"], indent=2))
@@ -0,0 +1,235 @@
+"""Long-running parse server that keeps the grammar warm between requests.
+
+Every `python parser.py` run pays for interpreter startup, importing the
+generated TSqlLexer/TSqlParser, deserializing their ATNs and warming the
+prediction DFAs before the first statement is parsed. The daemon pays that
+once and then serves parse requests over localhost HTTP or a Unix domain
+socket, so parsing one small procedure takes milliseconds.
+
+    GET  /health              {"status": "ok", "requests": n, ...}
+    POST /parse?name=X.sql    body: SQL text (UTF-8)
+                              -> {"name", "ast", "seconds", "prediction"}
+    POST /shutdown            stop the daemon (with --token: only given the
+                              header X-Parse-Daemon-Token: <token>)
+
+Requests are served one at a time by a single warm parser (the ANTLR
+runtime is not thread-safe). Use parse_client.py to talk to it. The daemon
+has no other authentication: listening on anything but a loopback address
+requires --token, so that at least /shutdown is not open to the network.
+
+Usage:
+    python parse_daemon.py --port 8765 --atn-cache .atn_cache.pkl --warmup input
+    python parse_daemon.py --socket /tmp/sybase_parser.sock
+"""
+import argparse
+import hmac
+import io
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import parser as sql_parser
+from ast_cache import ASTCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+TOKEN_HEADER = "X-Parse-Daemon-Token"
+
+
+class ParseService:
+    """The warm parser behind the daemon: parses SQL text into AST nodes."""
+
+    def __init__(self, prediction="sll", cache=None):
+        self.prediction = prediction
+        self.cache = cache
+        self.started = time.time()
+        self.requests = 0
+        self.failures = 0
+        self.seconds = 0.0
+
+    def warmup(self, pattern):
+        """Parse the files matching `pattern` once to warm the prediction DFAs."""
+        files = sql_parser.find_sql_files(pattern)
+        started = time.perf_counter()
+        for input_file in files:
+            try:
+                with redirect_stdout(io.StringIO()):
+                    sql_parser.parse_file(input_file, self.prediction)
+            except Exception as e:
+                print(f"❌ Warm-up failed on {input_file}: {e}")
+        return len(files), time.perf_counter() - started
+
+    def parse(self, sql_text, name="<input>"):
+        before = dict(sql_parser.PREDICTION_STATS)
+        started = time.perf_counter()
+        self.requests += 1
+        try:
+            # ASTBuilder reports progress with print(); keep it out of the daemon log
+            with redirect_stdout(io.StringIO()):
+                ast = sql_parser.parse_text(sql_text, name, self.prediction, self.cache)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.seconds += elapsed
+        return {
+            "name": name,
+            "ast": ast,
+            "seconds": elapsed,
+            "prediction": {k: sql_parser.PREDICTION_STATS[k] - before[k]
+                           for k in sql_parser.PREDICTION_STATS},
+        }
+
+    def health(self):
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+            "requests": self.requests,
+            "failures": self.failures,
+            "parse_seconds": self.seconds,
+            "prediction": self.prediction,
+            "ast_cache": bool(self.cache),
+        }
+
+
+class ParseRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SybaseParseDaemon/1.0"
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._reply(200, self.server.service.health())
+        else:
+            self._reply(404, {"error": f"unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if url.path == "/shutdown":
+            token = self.server.token
+            if token and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), token):
+                self._reply(403, {"error": f"/shutdown requires the {TOKEN_HEADER} header"})
+                return
+            self._reply(200, {"status": "stopping"})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if url.path != "/parse":
+            self._reply(404, {"error": f"unknown endpoint: {self.path}"})
+            return
+        name = parse_qs(url.query).get("name", ["<input>"])[0]
+        try:
+            sql_text = body.decode("utf-8")
+        except UnicodeDecodeError as e:
+            self._reply(400, {"error": f"SQL text is not UTF-8: {e}"})
+            return
+        try:
+            self._reply(200, self.server.service.parse(sql_text, name))
+        except Exception as e:
+            print(f"❌ Failed to parse {name}: {e}")
+            self._reply(500, {"name": name, "error": str(e)})
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class UnixHTTPServer(HTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)  # stale socket of an earlier daemon
+        # HTTPServer.server_bind expects a (host, port) address
+        super(HTTPServer, self).server_bind()
+        self.server_name = "localhost"
+        self.server_port = 0
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # a host name: may resolve to any interface
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, token=None):
+    if not socket_path and not token and not is_loopback(host):
+        raise ValueError(f"refusing to listen on {host} without --token")
+    if socket_path:
+        server = UnixHTTPServer(socket_path, ParseRequestHandler)
+    else:
+        server = HTTPServer((host, port), ParseRequestHandler)
+    server.service = service
+    server.token = token
+    return server
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Serve Sybase SQL parse requests from a warm parser")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST,
+                            help="Interface to listen on (default: localhost only; any other needs --token)")
+    arg_parser.add_argument("--token", default=os.environ.get("PARSE_DAEMON_TOKEN"),
+                            help="Secret that POST /shutdown must send (default: $PARSE_DAEMON_TOKEN)")
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument("--socket", help="Listen on this Unix domain socket instead of TCP")
+    arg_parser.add_argument("--prediction", choices=["sll", "ll"], default="sll")
+    arg_parser.add_argument("--atn-cache", help="Restore warmed lexer/parser DFAs from this file (see atn_cache.py)")
+    arg_parser.add_argument("--warmup", help="Directory or glob of .sql files to parse once before serving")
+    arg_parser.add_argument("--ast-cache", default=DEFAULT_CACHE_PATH, help="Batch AST cache file (default: .ast_cache.sqlite)")
+    arg_parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                            help="Evict least recently used batches once the AST cache exceeds this many MB")
+    arg_parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the AST cache")
+    args = arg_parser.parse_args()
+
+    if args.atn_cache:
+        from atn_cache import load_atn_cache
+        if not load_atn_cache(args.atn_cache):
+            print(f"⚠️ ATN cache not used: {args.atn_cache}")
+
+    if not args.socket and not args.token and not is_loopback(args.host):
+        arg_parser.error(f"--host {args.host} is not a loopback address; pass --token to protect /shutdown")
+
+    # Import the grammar now rather than on the first request
+    sql_parser.load_lexer()
+    sql_parser.load_parser()
+    cache = None if args.no_cache else ASTCache(args.ast_cache, args.cache_size * 1024 * 1024)
+    service = ParseService(args.prediction, cache)
+    if args.warmup:
+        count, seconds = service.warmup(args.warmup)
+        print(f"⏱️ Warmed up on {count} file(s) in {seconds:.2f}s")
+
+    server = make_server(service, args.host, args.port, args.socket, args.token)
+    where = args.socket or f"http://{args.host}:{server.server_port}"
+    print(f"✅ Parse daemon {os.getpid()} listening on {where}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if cache:
+            cache.close()
+        print(f"✅ Parse daemon stopped after {service.requests} request(s)")
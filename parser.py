@@ -1,8 +1,81 @@
+import argparse
+import glob
+import importlib
 import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from antlr4 import *
-from TSqlLexer import TSqlLexer
-from TSqlParser import TSqlParser
-from ast_listener import ASTBuilder  # Make sure this is the correct class name
+from antlr4.atn.PredictionMode import PredictionMode
+from antlr4.error.ErrorListener import ConsoleErrorListener
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
+from antlr4.ListTokenSource import ListTokenSource
+from ast_cache import ASTCache, batch_text, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+import decision_profiler
+import hook_profiler
+import timing
+from timing import phase
+
+# The generated grammar modules are most of parser.py's startup time, so
+# they are imported on first use: the lexer once a file is split into
+# batches, the parser (with ASTBuilder and ASTWalker) once a batch really
+# has to be parsed. --help and runs served from the AST cache skip them.
+TSqlLexer = None
+TSqlParser = None
+ASTBuilder = None
+ASTWalker = None
+GRAMMAR_MODULES = ("TSqlLexer", "TSqlParser", "ast_listener", "ast_walker")
+IMPORT_SECONDS = {}  # module -> seconds its import took in this process (None: preloaded)
+
+
+def _timed_import(name):
+    if name in sys.modules:
+        # Already imported elsewhere (e.g. by hook_profiler, or as a
+        # dependency of another grammar module): its cost was not seen here
+        IMPORT_SECONDS.setdefault(name, None)
+        return sys.modules[name]
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_SECONDS.setdefault(name, time.perf_counter() - started)
+    return module
+
+
+def load_lexer():
+    global TSqlLexer
+    if TSqlLexer is None:
+        TSqlLexer = _timed_import("TSqlLexer").TSqlLexer
+    return TSqlLexer
+
+
+def load_parser():
+    global TSqlParser, ASTBuilder, ASTWalker
+    if TSqlParser is None:
+        TSqlParser = _timed_import("TSqlParser").TSqlParser
+        ASTBuilder = _timed_import("ast_listener").ASTBuilder
+        ASTWalker = _timed_import("ast_walker").ASTWalker
+    return TSqlParser
+
+
+def print_import_report():
+    """Import time of each grammar module, or the time a run saved by not needing it."""
+    skipped = [name for name in GRAMMAR_MODULES if name not in IMPORT_SECONDS]
+    for name in skipped:
+        _timed_import(name)  # measured only now, after the run
+    print("\n⏱️ Grammar module imports:")
+    for name in GRAMMAR_MODULES:
+        seconds = IMPORT_SECONDS[name]
+        if seconds is None:
+            print(f"   {name:<14} preloaded (imported before parser.py needed it, not timed)")
+        elif name in skipped:
+            print(f"   {name:<14} not needed ({seconds * 1000:.0f} ms saved)")
+        else:
+            print(f"   {name:<14} {seconds * 1000:>6.0f} ms")
+    saved = sum(IMPORT_SECONDS[name] or 0 for name in skipped) * 1000
+    total = sum(seconds or 0 for seconds in IMPORT_SECONDS.values()) * 1000
+    print(f"   Saved {saved:.0f} ms of {total:.0f} ms")
+
 
 # Helper to pretty-print SQL from ctx
 
@@ -16,29 +89,471 @@ def get_clean_query(ctx):
         return ""
 
 
-input_file = "input/08_sp_ProcessFullPayrollCycle.sql"
+# Counters for the two-stage prediction mode:
+#   sll         -> parses that succeeded with fast SLL prediction
+#   ll_fallback -> parses that failed in SLL and were redone with full LL
+PREDICTION_STATS = {"sll": 0, "ll_fallback": 0}
+
+
+def parse_tree(stream, rule="tsql_file", prediction="sll"):
+    """Parse `stream` starting at `rule`.
+
+    With prediction="sll" the parser first runs with SLL prediction and a
+    bail-out error strategy; only if that fails is the input re-parsed with
+    full LL prediction and the default error recovery, so the resulting tree
+    (and error reporting) is the same as a plain LL parse.
+    """
+    parser = load_parser()(stream)
+    if decision_profiler.PROFILER:
+        decision_profiler.PROFILER.attach(parser)
+    if prediction == "ll":
+        return getattr(parser, rule)()
+
+    parser._interp.predictionMode = PredictionMode.SLL
+    parser.removeErrorListeners()
+    parser._errHandler = BailErrorStrategy()
+    try:
+        tree = getattr(parser, rule)()
+        PREDICTION_STATS["sll"] += 1
+        return tree
+    except ParseCancellationException:
+        PREDICTION_STATS["ll_fallback"] += 1
+
+    # Second stage: rewind and re-parse with full LL
+    parser.reset()
+    parser.addErrorListener(ConsoleErrorListener.INSTANCE)
+    parser._errHandler = DefaultErrorStrategy()
+    parser._interp.predictionMode = PredictionMode.LL
+    return getattr(parser, rule)()
+
+
+def split_batches(lexer):
+    """Yield the token list of each GO-separated batch produced by `lexer`.
+
+    Tokens are pulled from the lexer lazily, so only the batch currently
+    being built is held in memory. A batch ends after its GO (and the
+    optional `GO <count>`); batches without any default-channel token
+    (blank lines or comments after the last GO) are dropped.
+    """
+    load_lexer()
+    batch = []
+    has_code = False
+    after_go = False
+    while True:
+        tok = lexer.nextToken()
+        if tok.type == Token.EOF:
+            break
+        if tok.channel != Token.DEFAULT_CHANNEL:
+            batch.append(tok)
+            continue
+        if after_go:
+            after_go = False
+            if tok.type == TSqlLexer.DECIMAL:
+                batch.append(tok)  # GO <count>
+                continue
+            if has_code:
+                yield batch
+            batch, has_code = [], False
+        batch.append(tok)
+        has_code = True
+        if tok.type == TSqlLexer.GO:
+            after_go = True
+    if has_code:
+        yield batch
+
+
+def parse_batch(tokens, prediction="sll", emit=None):
+    """Parse one GO batch with `parser.batch()` and return its AST nodes.
+
+    With `emit`, each top-level node is passed to it as soon as ASTBuilder
+    finishes it and the returned list is empty.
+    """
+    return build_ast(parse_batch_tree(tokens, prediction), emit)
+
+
+def parse_batch_tree(tokens, prediction="sll"):
+    """Parse tree of one GO batch (the parse half of parse_batch)."""
+    load_parser()
+    with phase("parse"):
+        stream = CommonTokenStream(ListTokenSource(tokens))
+        tree = parse_tree(stream, "batch", prediction)
+        if stream.LA(1) != Token.EOF:
+            # Several batch-level statements without a GO between them:
+            # parse the batch the same way tsql_file would
+            stream.seek(0)
+            tree = parse_tree(stream, "tsql_file", prediction)
+    if timing.TIMER:
+        timing.TIMER.count("tree_nodes", timing.count_tree_nodes(tree))
+    return tree
+
+
+def build_ast(tree, emit=None):
+    """Walk `tree` with ASTBuilder and return its AST nodes (see parse_batch)."""
+    load_parser()
+    with phase("walk"):
+        builder_class = hook_profiler.PROFILER.builder_class if hook_profiler.PROFILER else ASTBuilder
+        listener = builder_class(emit)
+        walker = ASTWalker.DEFAULT
+        walker.walk(listener, tree)
+    return listener.ast
+
+
+def parse_file(input_file, prediction="sll", cache=None, emit=None):
+    """Parse `input_file` and return its AST nodes.
+
+    With `emit`, nodes are handed to it as they are produced instead
+    (see parse_batch) and the returned list is empty.
+    """
+    # Load SQL from file
+    input_stream = FileStream(input_file, encoding="utf-8")
+    return parse_stream(input_stream, input_file, prediction, cache, emit)
+
+
+def parse_text(sql_text, name="<input>", prediction="sll", cache=None, emit=None):
+    """parse_file for SQL already in memory; `name` is used in reports."""
+    input_stream = InputStream(sql_text)
+    return parse_stream(input_stream, name, prediction, cache, emit)
+
+
+def parse_stream(input_stream, input_file, prediction="sll", cache=None, emit=None):
+    lexer = load_lexer()(input_stream)
+
+    # Parse each GO batch on its own and merge the results, so only one
+    # batch's parse tree is alive at a time. Batches whose text is already
+    # in the AST cache are not parsed at all.
+    ast = []
+    add = emit or ast.append
+    batches = split_batches(lexer)
+    if timing.TIMER:
+        timing.TIMER.begin_file(input_file)
+        batches = timing.TIMER.timed_batches(batches)
+        add = timing.TIMER.counting(add)
+    for tokens in batches:
+        if cache is None:
+            parse_batch(tokens, prediction, add)
+            continue
+        key = cache.key(batch_text(tokens))
+        nodes = cache.get(key)
+        if nodes is None:
+            # Keep the batch's nodes for the cache while still passing
+            # each one on as soon as it is finished
+            nodes = []
+            parse_batch(tokens, prediction, lambda node: (nodes.append(node), add(node)))
+            cache.put(key, nodes)
+        else:
+            for node in nodes:
+                add(node)
+    if cache is not None:
+        cache.flush()  # one write per file for the hits' last_used
+    return ast
+
+
+OUTPUT_FORMATS = ("json", "jsonl")
+
+
+def output_path_for(input_file, output_dir="output", fmt="json"):
+    # input/08_sp_X.sql -> output/ast_08_sp_X.json (or .jsonl)
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    return os.path.join(output_dir, f"ast_{stem}.{fmt}")
+
+
+def output_paths(files, output_dir="output", fmt="json"):
+    """output_path_for of each file. Raises ValueError if two inputs (say
+    a/proc.sql and b/proc.sql of a recursive glob) share an output path."""
+    paths = {}
+    owners = {}
+    for input_file in files:
+        output_path = output_path_for(input_file, output_dir, fmt)
+        key = os.path.normcase(os.path.abspath(output_path))
+        if key in owners:
+            raise ValueError(f"{owners[key]} and {input_file} would both be written to {output_path}")
+        owners[key] = input_file
+        paths[input_file] = output_path
+    return paths
+
+
+def write_ast(ast, output_path):
+    with phase("serialize"):
+        with open(output_path, "w") as f:
+            json.dump(ast, f, indent=2)
+
+
+def stream_ast(input_file, output_path, prediction="sll", cache=None, check=None):
+    """Parse `input_file` into JSON Lines at `output_path`.
+
+    Every procedure (and other top-level node) is written as one compact
+    line and flushed the moment ASTBuilder finishes it, so readers can
+    follow the file while it is being parsed and finished procedures are
+    not kept in memory. `check` optionally wraps the writer (see
+    validating). Returns the number of nodes written.
+    """
+    count = 0
+    with open(output_path, "w") as f:
+        def emit(node):
+            nonlocal count
+            with phase("serialize"):
+                f.write(json.dumps(node, separators=(",", ":")) + "\n")
+                f.flush()
+            count += 1
+        parse_file(input_file, prediction, cache, check(emit) if check else emit)
+    return count
+
+
+def validating(emit, validator, errors):
+    """Wrap `emit` so every top-level node is checked against `validator`
+    (the schema of one AST array item) as soon as ASTBuilder finishes it,
+    before it is serialized. Error messages are appended to `errors`."""
+    from validator import node_name
+    index = 0
+
+    def check(node):
+        nonlocal index
+        with phase("validate"):
+            for err in sorted(validator.iter_errors(node), key=lambda e: e.path):
+                path = " -> ".join(str(p) for p in [index, *err.path])
+                errors.append(f"{node_name(node, index)}: {path}: {err.message}")
+        index += 1
+        emit(node)
+    return check
+
+
+def process_file(input_file, output_path, prediction="sll", fmt="json", cache=None, validator=None):
+    """Parse `input_file` and write it to `output_path` in `fmt`. Given a
+    schema `validator` (see load_item_validator), each procedure is
+    validated in memory on its way out. Returns (node count, errors)."""
+    errors = []
+    check = (lambda emit: validating(emit, validator, errors)) if validator else None
+    if fmt == "jsonl":
+        count = stream_ast(input_file, output_path, prediction, cache, check)
+    else:
+        ast = []
+        parse_file(input_file, prediction, cache, check(ast.append) if check else ast.append)
+        write_ast(ast, output_path)
+        count = len(ast)
+    return count, errors
+
+
+def report_schema_errors(output_path, errors, limit=5):
+    print(f"❌ {len(errors)} schema error(s) in {output_path}")
+    for message in errors[:limit]:
+        print(f"    - {message}")
+
+
+_worker_cache = None
+_worker_validator = None
+
+
+def _init_worker(atn_cache, ast_cache, cache_max_bytes, schema=None, timed=False,
+                 profile_hooks=False, profile_decisions=False):
+    # Runs once per pool worker; the grammar modules are imported by the
+    # first batch the worker has to lex / parse (see load_parser)
+    global _worker_cache, _worker_validator
+    if atn_cache:
+        from atn_cache import load_atn_cache
+        load_atn_cache(atn_cache)
+    if ast_cache:
+        _worker_cache = ASTCache(ast_cache, cache_max_bytes)
+    if schema:
+        from validator import load_item_validator
+        _worker_validator = load_item_validator(schema, fast=True)
+    if timed:
+        timing.enable()
+    if profile_hooks:
+        hook_profiler.enable()
+    if profile_decisions:
+        decision_profiler.enable()
+
+
+def _parse_job(job):
+    input_file, output_path, prediction, fmt = job
+    before = dict(PREDICTION_STATS)
+    hits = _worker_cache.hits if _worker_cache else 0
+    count, errors = process_file(
+        input_file, output_path, prediction, fmt, _worker_cache, _worker_validator)
+    stats = {k: PREDICTION_STATS[k] - before[k] for k in PREDICTION_STATS}
+    cache_hits = _worker_cache.hits - hits if _worker_cache else 0
+    timings = timing.TIMER.files.pop() if timing.TIMER else None
+    hooks = hook_profiler.PROFILER.snapshot(reset=True) if hook_profiler.PROFILER else None
+    decisions = None
+    if decision_profiler.PROFILER:
+        decisions = decision_profiler.PROFILER.decisions
+        decision_profiler.PROFILER.decisions = {}
+    return count, stats, cache_hits, errors, timings, hooks, decisions
+
+
+def find_sql_files(pattern):
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.sql")
+    return sorted(glob.glob(pattern, recursive=True))
+
+
+def parse_directory(pattern, output_dir="output", workers=None, prediction="sll",
+                    atn_cache=None, ast_cache=None, cache_max_bytes=DEFAULT_MAX_BYTES, fmt="json",
+                    schema=None):
+    """Parse every .sql file matching `pattern` over a process pool.
+
+    `pattern` is a directory (all *.sql inside it) or a glob. Files are
+    submitted largest first so a big file never starts last, and each one
+    is written to `output_dir` as ast_<name>.json (.jsonl with fmt="jsonl",
+    see stream_ast). With `atn_cache` every worker restores the warmed DFAs
+    before its first file; with `ast_cache` the workers share the batch AST
+    cache at that path; with `schema` every output is validated against it.
+    When timing or profiling is enabled the workers' records are merged
+    into timing.TIMER, hook_profiler.PROFILER and
+    decision_profiler.PROFILER. Returns the number of files that failed to
+    parse or to validate.
+    """
+    files = find_sql_files(pattern)
+    files.sort(key=os.path.getsize, reverse=True)
+    try:
+        outputs = output_paths(files, output_dir, fmt)
+    except ValueError as e:
+        print(f"❌ {e}; rename one of them or parse them into different output directories")
+        return len(files)
+    os.makedirs(output_dir, exist_ok=True)
+
+    failed = 0
+    invalid = 0
+    cache_hits = 0
+    initargs = (atn_cache, ast_cache, cache_max_bytes, schema,
+                timing.TIMER is not None, hook_profiler.PROFILER is not None,
+                decision_profiler.PROFILER is not None)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+        futures = {}
+        for input_file in files:
+            job = (input_file, outputs[input_file], prediction, fmt)
+            futures[pool.submit(_parse_job, job)] = job
+        for future in as_completed(futures):
+            input_file, output_path = futures[future][:2]
+            try:
+                count, stats, hits, errors, timings, hooks, decisions = future.result()
+                for k, v in stats.items():
+                    PREDICTION_STATS[k] += v
+                cache_hits += hits
+                if timings:
+                    timing.TIMER.merge([timings])
+                if hooks:
+                    hook_profiler.PROFILER.merge(hooks)
+                if decisions:
+                    decision_profiler.PROFILER.merge(decisions)
+                if errors:
+                    invalid += 1
+                    report_schema_errors(output_path, errors)
+                    continue
+                print(f"✅ {input_file} -> {output_path} ({count} node(s))")
+            except Exception as e:
+                failed += 1
+                print(f"❌ Failed to parse {input_file}: {e}")
 
-# Load SQL from file
-input_stream = FileStream(input_file, encoding="utf-8")
+    print(f"\n✅ Parsed {len(files) - failed}/{len(files)} file(s) into: {output_dir}")
+    if schema:
+        print(f"   Schema: {invalid} file(s) with validation errors")
+    if ast_cache:
+        print(f"   AST cache: {cache_hits} batch(es) reused")
+    return failed + invalid
 
-# Lexer and Parser
-lexer = TSqlLexer(input_stream)
-stream = CommonTokenStream(lexer)
-parser = TSqlParser(stream)
 
-tree = parser.tsql_file()        # Use if SQL contains full batch
-# tree = parser.sql_clauses()      # Use if SQL has only one procedure
-# tree = parser.batch()             # Most reliable for Sybase procedures
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Parse Sybase SQL into AST JSON")
+    arg_parser.add_argument(
+        "--input", default="input/08_sp_ProcessFullPayrollCycle.sql",
+        help="Path to a .sql file containing Sybase stored procedure(s)")
+    arg_parser.add_argument(
+        "--output", help="Path to save AST JSON (default: output/ast_<name>.json or .jsonl)")
+    arg_parser.add_argument(
+        "--input-dir", help="Directory or glob of .sql files to parse in parallel (overrides --input)")
+    arg_parser.add_argument(
+        "--output-dir", default="output", help="Where --input-dir mode writes ast_<name>.json files")
+    arg_parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes for --input-dir (default: CPU count)")
+    arg_parser.add_argument(
+        "--format", choices=OUTPUT_FORMATS, default="json",
+        help="json: one indented array written at the end; jsonl: one procedure per line, written as soon as it is parsed")
+    arg_parser.add_argument(
+        "--prediction", choices=["sll", "ll"], default="sll",
+        help="sll: try fast SLL prediction first and fall back to full LL on failure; ll: always use full LL")
+    arg_parser.add_argument(
+        "--atn-cache", help="Restore warmed lexer/parser DFAs from this file (build it with atn_cache.py)")
+    arg_parser.add_argument(
+        "--ast-cache", default=DEFAULT_CACHE_PATH, help="Batch AST cache file (default: .ast_cache.sqlite)")
+    arg_parser.add_argument(
+        "--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="Evict least recently used batches once the AST cache exceeds this many MB")
+    arg_parser.add_argument(
+        "--no-cache", action="store_true", help="Always re-parse; neither read nor write the AST cache")
+    arg_parser.add_argument(
+        "--schema", help="Validate each procedure against this JSON schema (e.g. fixedSchema/fixedschema.json) in memory as soon as it is built, before it is written")
+    arg_parser.add_argument(
+        "--timing-report", help="Write per-file/per-batch lex, parse, walk, serialize and validate times to this JSON file")
+    arg_parser.add_argument(
+        "--profile-hooks", nargs="?", const="-", metavar="JSON",
+        help="Count and time every ASTBuilder callback; print a table, or write JSON to the given path")
+    arg_parser.add_argument(
+        "--profile-decisions", nargs="?", const="-", metavar="JSON",
+        help="Profile TSqlParser grammar decisions (lookahead, LL fallbacks, ambiguities); "
+             "print a table, or write JSON to the given path. Combine with --prediction ll to see every LL fallback")
+    arg_parser.add_argument(
+        "--import-report", action="store_true",
+        help="Print how long importing each generated grammar module took, or the time saved when a run did not need it")
+    args = arg_parser.parse_args()
+    ast_cache = None if args.no_cache else args.ast_cache
+    cache_max_bytes = args.cache_size * 1024 * 1024
 
-# === Walk the Parse Tree ===
-listener = ASTBuilder()
-walker = ParseTreeWalker()
-walker.walk(listener, tree)
+    if args.timing_report:
+        timing.enable()
+    if args.profile_hooks:
+        hook_profiler.enable()
+    if args.profile_decisions:
+        decision_profiler.enable()
 
-# === Dump AST to JSON ===
-output_path = r"C:\Users\SreeHariP\OneDrive - McLaren Strategic Solutions US Inc\Documents\tool2_parser\output\ast_08_sp_ProcessFullPayrollCycle.json"
+    if args.atn_cache:
+        from atn_cache import load_atn_cache
+        if not load_atn_cache(args.atn_cache):
+            print(f"⚠️ ATN cache not used: {args.atn_cache}")
 
-with open(output_path, "w") as f:
-    json.dump(listener.ast, f, indent=2)
+    if args.input_dir:
+        failed = parse_directory(
+            args.input_dir, args.output_dir, args.workers, args.prediction,
+            args.atn_cache, ast_cache, cache_max_bytes, args.format, args.schema)
+    else:
+        failed = 0
+        output_path = args.output or output_path_for(args.input, fmt=args.format)
+        cache = ASTCache(ast_cache, cache_max_bytes) if ast_cache else None
+        validator = None
+        if args.schema:
+            from validator import load_item_validator
+            validator = load_item_validator(args.schema, fast=True)
+        _, errors = process_file(args.input, output_path, args.prediction, args.format, cache, validator)
+        print(f"\n✅ AST generated and saved to: {output_path}")
+        if errors:
+            failed = 1
+            report_schema_errors(output_path, errors)
+        if cache:
+            print(f"   AST cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+            cache.close()
 
-print(f"\n✅ AST generated and saved to: {output_path}")
+    if args.prediction == "sll":
+        print(f"   Prediction: {PREDICTION_STATS['sll']} SLL, "
+              f"{PREDICTION_STATS['ll_fallback']} LL fallback(s)")
+    if timing.TIMER:
+        timing.TIMER.write(args.timing_report)
+        print(f"⏱️ Timing report saved to: {args.timing_report}")
+    if hook_profiler.PROFILER:
+        if args.profile_hooks == "-":
+            hook_profiler.PROFILER.print_table()
+        else:
+            hook_profiler.PROFILER.write(args.profile_hooks)
+            print(f"⏱️ Callback profile saved to: {args.profile_hooks}")
+    if decision_profiler.PROFILER:
+        if args.profile_decisions == "-":
+            decision_profiler.PROFILER.print_table()
+        else:
+            decision_profiler.PROFILER.write(args.profile_decisions)
+            print(f"⏱️ Decision profile saved to: {args.profile_decisions}")
+    if args.import_report:
+        if args.input_dir:
+            print("⚠️ --import-report: --input-dir imports the grammar in its worker processes, not in this one")
+        else:
+            print_import_report()
+    sys.exit(1 if failed else 0)
@@ -1,25 +1,273 @@
-import subprocess
-import os
+"""Parse and validate a folder of .sql files in one process.
+
+The files flow through five stages, each on its own thread and connected
+by bounded queues, so e.g. procedures of file N are validated and written
+while file N+1 is still being parsed:
+
+    discover -> lex/parse -> build AST -> validate -> write
+      files      batches      batches     procedures   files
+
+A full queue blocks the stage feeding it, so at most `--queue-size` parse
+trees (or files) wait between two stages. At the end the throughput of
+every stage (items per second of busy time) and the depth of the queue in
+front of it are reported.
+
+Usage:
+    python run_all.py
+    python run_all.py --input input --output-dir output --schema fixedSchema/fixedschema.json
+"""
+import argparse
 import json
-from pathlib import Path
+import os
+import queue
+import sys
+import threading
+import time
+from antlr4 import FileStream
+
+import parser as sql_parser
+from ast_cache import ASTCache, batch_text, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+
+DEFAULT_SCHEMA = "fixedSchema/fixedschema.json"
 
+# Marks the end of a stage's input
+STOP = object()
 
-# Commands: run local parser and validator 
-commands = [
-    ["python", "parser.py"],
-    ["python", "validator.py", "output_data/ast.json", "fixedSchema/fixedschema.json"],
-]
 
+class Stage(threading.Thread):
+    """Takes items from `inbox`, passes each to `handle(item, put)` and
+    counts the items handled, the time spent and the inbox depth."""
 
-def run_commands():
-    for cmd in commands:
-        print(f"\n⚡ Running: {' '.join(cmd)} (cwd={os.getcwd()})")
+    def __init__(self, name, unit, handle, inbox, outbox=None, finish=None):
+        super().__init__(name=name, daemon=True)
+        self.unit = unit
+        self.handle = handle
+        self.finish = finish  # called on the stage's own thread once it is done
+        self.inbox = inbox
+        self.outbox = outbox
+        self.items = 0
+        self.busy = 0.0
+        self.blocked = 0.0  # waiting for room in outbox
+        self.depth_max = 0
+        self.depth_total = 0
+        self.takes = 0
+        self.error = None
+
+    def put(self, item):
+        started = time.perf_counter()
+        self.outbox.put(item)
+        self.blocked += time.perf_counter() - started
+
+    def run(self):
         try:
-            subprocess.run(cmd, check=True)
-        except subprocess.CalledProcessError:
-            print(f"❌ Failed: {' '.join(cmd)}")
-            break
+            while True:
+                depth = self.inbox.qsize()
+                self.depth_max = max(self.depth_max, depth)
+                self.depth_total += depth
+                self.takes += 1
+                item = self.inbox.get()
+                if item is STOP:
+                    break
+                started = time.perf_counter()
+                self.items += self.handle(item, self.put)
+                self.busy += time.perf_counter() - started
+        except Exception as e:
+            self.error = e
+            print(f"❌ Stage {self.name} stopped: {e}")
+            # Keep draining so upstream stages are not blocked forever
+            while self.inbox.get() is not STOP:
+                pass
+        finally:
+            if self.finish:
+                self.finish()
+            if self.outbox is not None:
+                self.outbox.put(STOP)
+
+    def row(self):
+        busy = self.busy - self.blocked
+        return {
+            "stage": self.name, "unit": self.unit, "items": self.items,
+            "busy_seconds": busy, "per_second": self.items / busy if busy > 0 else None,
+            "blocked_seconds": self.blocked,
+            "queue_max": self.depth_max,
+            "queue_avg": self.depth_total / self.takes if self.takes else 0,
+        }
+
+
+def run_pipeline(pattern="input", output_dir="output", schema=DEFAULT_SCHEMA, fmt="json",
+                 prediction="sll", ast_cache=None, cache_max_bytes=DEFAULT_MAX_BYTES, queue_size=4):
+    """Run the pipeline over the .sql files matching `pattern`. Returns
+    (number of failed or invalid files, stage rows)."""
+    # discover: runs on this thread before the stages start
+    started = time.perf_counter()
+    files = sql_parser.find_sql_files(pattern)
+    try:
+        outputs = sql_parser.output_paths(files, output_dir, fmt)
+    except ValueError as e:
+        print(f"❌ {e}; rename one of them or parse them into different output directories")
+        return len(files), []
+    discover = {"stage": "discover", "unit": "files", "items": len(files),
+                "busy_seconds": time.perf_counter() - started, "queue_max": 0, "queue_avg": 0}
+    os.makedirs(output_dir, exist_ok=True)
+    validator = None
+    if schema:
+        from validator import load_item_validator
+        validator = load_item_validator(schema, fast=True)
+    files_q, trees_q, asts_q, checked_q = (queue.Queue(queue_size) for _ in range(4))
+    # Each stage that touches the AST cache opens (and closes) its own
+    # SQLite connection, since connections may not cross threads
+    caches = {}
+
+    def cache_for(stage):
+        if ast_cache and stage not in caches:
+            caches[stage] = ASTCache(ast_cache, cache_max_bytes)
+        return caches.get(stage)
+
+    def close_cache(stage):
+        return lambda: caches[stage].close() if stage in caches else None
+
+    def lex_parse(input_file, put):
+        # -> ("tree", file, tree, cache key) / ("nodes", file, cached nodes, None) per batch,
+        #    then ("end", file, None, error)
+        cache = cache_for("parse")
+        count = 0
+        try:
+            lexer = sql_parser.load_lexer()(FileStream(input_file, encoding="utf-8"))
+            for tokens in sql_parser.split_batches(lexer):
+                count += 1
+                key = cache.key(batch_text(tokens)) if cache else None
+                nodes = cache.get(key) if cache else None
+                if nodes is not None:
+                    put(("nodes", input_file, nodes, None))
+                else:
+                    put(("tree", input_file, sql_parser.parse_batch_tree(tokens, prediction), key))
+        except Exception as e:
+            put(("end", input_file, None, f"{type(e).__name__}: {e}"))
+            return count
+        finally:
+            if cache:
+                cache.flush()
+        put(("end", input_file, None, None))
+        return count
+
+    pending = {}  # file -> AST nodes built so far
+    build_errors = {}  # file -> first error building it; its later batches are skipped
+
+    def build(item, put):
+        # -> (file, nodes, error) once per file
+        kind, input_file, payload, extra = item
+        nodes = pending.setdefault(input_file, [])
+        if kind == "end":
+            put((input_file, pending.pop(input_file), extra or build_errors.pop(input_file, None)))
+            return 0
+        if input_file in build_errors:
+            return 0
+        if kind == "nodes":
+            nodes.extend(payload)
+            return 1
+        try:
+            built = sql_parser.build_ast(payload)
+            if extra is not None:
+                cache_for("build").put(extra, built)
+        except Exception as e:
+            build_errors[input_file] = f"{type(e).__name__}: {e}"
+            return 0
+        nodes.extend(built)
+        return 1
+
+    def validate(item, put):
+        # -> (file, nodes, error, schema errors)
+        input_file, nodes, error = item
+        messages = []
+        if validator and not error:
+            check = sql_parser.validating(lambda node: None, validator, messages)
+            for node in nodes:
+                check(node)
+        put((input_file, nodes, error, messages))
+        return len(nodes)
+
+    results = {"ok": 0, "failed": 0, "invalid": 0}
+
+    def write(item, put):
+        input_file, nodes, error, messages = item
+        if error:
+            results["failed"] += 1
+            print(f"❌ Failed to parse {input_file}: {error}")
+            return 1
+        output_path = outputs[input_file]
+        if fmt == "jsonl":
+            with open(output_path, "w") as f:
+                for node in nodes:
+                    f.write(json.dumps(node, separators=(",", ":")) + "\n")
+        else:
+            sql_parser.write_ast(nodes, output_path)
+        if messages:
+            results["invalid"] += 1
+            sql_parser.report_schema_errors(output_path, messages)
+        else:
+            results["ok"] += 1
+            print(f"✅ {input_file} -> {output_path} ({len(nodes)} node(s))")
+        return 1
+
+    stages = [
+        Stage("lex/parse", "batches", lex_parse, files_q, trees_q, close_cache("parse")),
+        Stage("build AST", "batches", build, trees_q, asts_q, close_cache("build")),
+        Stage("validate", "procedures", validate, asts_q, checked_q),
+        Stage("write", "files", write, checked_q),
+    ]
+    for stage in stages:
+        stage.start()
+
+    # discover feeds the first queue
+    blocked = time.perf_counter()
+    for input_file in files:
+        files_q.put(input_file)
+    files_q.put(STOP)
+    discover["blocked_seconds"] = time.perf_counter() - blocked
+    discover["per_second"] = len(files) / discover["busy_seconds"] if discover["busy_seconds"] else None
+
+    for stage in stages:
+        stage.join()
+    elapsed = time.perf_counter() - started
+
+    rows = [discover] + [stage.row() for stage in stages]
+    crashed = [stage for stage in stages if stage.error]
+    print(f"\n✅ {results['ok']}/{len(files)} file(s) parsed and valid in {elapsed:.2f}s "
+          f"({results['failed']} failed, {results['invalid']} with schema errors)")
+    print_stages(rows)
+    return results["failed"] + results["invalid"] + len(crashed), rows
+
+
+def print_stages(rows):
+    print(f"\n{'stage':<10} {'items':>7} {'unit':<11} {'busy s':>8} {'per s':>9} {'blocked s':>10} "
+          f"{'queue max':>10} {'queue avg':>10}")
+    for r in rows:
+        rate = f"{r['per_second']:.1f}" if r["per_second"] else "-"
+        print(f"{r['stage']:<10} {r['items']:>7} {r['unit']:<11} {r['busy_seconds']:>8.3f} {rate:>9} "
+              f"{r['blocked_seconds']:>10.3f} {r['queue_max']:>10} {r['queue_avg']:>10.1f}")
 
 
 if __name__ == "__main__":
-    run_commands()
+    arg_parser = argparse.ArgumentParser(description="Parse and validate .sql files in one in-process pipeline")
+    arg_parser.add_argument("--input", default="input", help="Directory or glob of .sql files")
+    arg_parser.add_argument("--output-dir", default="output")
+    arg_parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="JSON schema to validate against ('' to skip)")
+    arg_parser.add_argument("--format", choices=sql_parser.OUTPUT_FORMATS, default="json")
+    arg_parser.add_argument("--prediction", choices=["sll", "ll"], default="sll")
+    arg_parser.add_argument("--atn-cache", help="Restore warmed lexer/parser DFAs from this file (see atn_cache.py)")
+    arg_parser.add_argument("--ast-cache", default=DEFAULT_CACHE_PATH, help="Batch AST cache file (default: .ast_cache.sqlite)")
+    arg_parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                            help="Evict least recently used batches once the AST cache exceeds this many MB")
+    arg_parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the AST cache")
+    arg_parser.add_argument("--queue-size", type=int, default=4, help="Items allowed to wait between two stages")
+    args = arg_parser.parse_args()
+
+    if args.atn_cache:
+        from atn_cache import load_atn_cache
+        if not load_atn_cache(args.atn_cache):
+            print(f"⚠️ ATN cache not used: {args.atn_cache}")
+
+    failed, _ = run_pipeline(args.input, args.output_dir, args.schema or None, args.format,
+                             args.prediction, None if args.no_cache else args.ast_cache,
+                             args.cache_size * 1024 * 1024, args.queue_size)
+    sys.exit(1 if failed else 0)
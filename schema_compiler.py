@@ -0,0 +1,387 @@
+"""Compile a JSON schema (fixedSchema/fixedschema.json) into Python code.
+
+jsonschema's Draft7Validator interprets the schema again for every node it
+checks. Our schema does not change at run time, so compile_validator()
+turns it into specialized Python instead: isinstance checks, precomputed
+enum sets, inlined property checks and one function per $ref target. The
+result reports the same errors (message and path) as Draft7Validator.
+
+Only the keywords our schemas use are supported: type, enum, required,
+properties, patternProperties, additionalProperties, items, min/maxItems,
+min/maxLength, allOf, anyOf, oneOf and local $ref. Anything else raises
+UnsupportedSchema, so callers can fall back to jsonschema.
+
+The validator is generated from the schema each time it is loaded, so it
+can never be stale. --output writes the generated module for inspection, and
+--check cross-checks it against Draft7Validator on real AST files:
+
+    python schema_compiler.py fixedSchema/fixedschema.json --output fixedschema_validator.py
+    python schema_compiler.py fixedSchema/fixedschema.json --check output
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+
+# Keywords that do not affect validation
+ANNOTATIONS = {"$schema", "$id", "$comment", "title", "description", "default", "examples", "definitions"}
+
+SUPPORTED = {
+    "$ref", "type", "enum", "required", "properties", "patternProperties", "additionalProperties",
+    "items", "minItems", "maxItems", "minLength", "maxLength", "allOf", "anyOf", "oneOf",
+}
+
+_TYPE_CHECKS = {
+    "string": "isinstance({v}, str)",
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "integer": "_is_integer({v})",
+}
+
+# Helpers shared by every generated module (messages as in jsonschema)
+_RUNTIME = '''import re
+
+
+def _is_integer(x):
+    if isinstance(x, bool):
+        return False
+    return isinstance(x, int) or (isinstance(x, float) and x.is_integer())
+
+
+def _extras_message(extras):
+    extras = sorted(extras, key=str)
+    verb = "was" if len(extras) == 1 else "were"
+    return "Additional properties are not allowed (%s %s unexpected)" % (
+        ", ".join(repr(extra) for extra in extras), verb)
+
+
+def _regex_message(extras, patterns):
+    verb = "does" if len(extras) == 1 else "do"
+    return "%s %s not match any of the regexes: %s" % (
+        ", ".join(repr(extra) for extra in sorted(extras)), verb, patterns)
+
+
+def _passes(check, x, path):
+    errors = []
+    check(x, path, errors)
+    return not errors
+
+
+def _any_of(checks, x, path, out):
+    if not any(_passes(check, x, path) for check in checks):
+        out.append((tuple(path), repr(x) + " is not valid under any of the given schemas"))
+
+
+def _one_of(checks, reprs, x, path, out):
+    valid = [i for i, check in enumerate(checks) if _passes(check, x, path)]
+    if not valid:
+        out.append((tuple(path), repr(x) + " is not valid under any of the given schemas"))
+    elif len(valid) > 1:
+        shown = [reprs[i] for i in valid[1:]] + [reprs[valid[0]]]
+        out.append((tuple(path), repr(x) + " is valid under each of " + ", ".join(shown)))
+'''
+
+
+class UnsupportedSchema(Exception):
+    pass
+
+
+class SchemaError:
+    """One validation error: the path into the instance and jsonschema's message."""
+    __slots__ = ("path", "message")
+
+    def __init__(self, path, message):
+        self.path = path
+        self.message = message
+
+    def __repr__(self):
+        return f"SchemaError({list(self.path)!r}, {self.message!r})"
+
+
+class CompiledValidator:
+    """Drop-in for Draft7Validator.iter_errors / is_valid."""
+
+    def __init__(self, schema, source):
+        self.schema = schema
+        self.source = source
+        namespace = {}
+        exec(compile(source, "<compiled schema>", "exec"), namespace)
+        self._check = namespace["validate"]
+
+    def iter_errors(self, instance):
+        out = []
+        self._check(instance, [], out)
+        return [SchemaError(path, message) for path, message in out]
+
+    def is_valid(self, instance):
+        out = []
+        self._check(instance, [], out)
+        return not out
+
+
+class _Compiler:
+    def __init__(self, root):
+        self.root = root
+        self.functions = {}  # id(schema) -> generated function name
+        self.pending = []  # (name, schema) not emitted yet
+        self.constants = []
+        self.variables = 0
+
+    def function_for(self, schema):
+        key = id(schema)
+        if key not in self.functions:
+            name = f"_check_{len(self.functions)}"
+            self.functions[key] = name
+            self.pending.append((name, schema))
+        return self.functions[key]
+
+    def constant(self, source):
+        name = f"_C{len(self.constants)}"
+        self.constants.append(f"{name} = {source}")
+        return name
+
+    def variable(self):
+        self.variables += 1
+        return f"v{self.variables}"
+
+    def resolve(self, ref):
+        if not ref.startswith("#"):
+            raise UnsupportedSchema(f"non-local $ref {ref!r}")
+        node = self.root
+        for part in filter(None, ref[1:].split("/")):
+            part = part.replace("~1", "/").replace("~0", "~")
+            node = node[int(part)] if isinstance(node, list) else node[part]
+        return node
+
+    def module(self):
+        entry = self.function_for(self.root)
+        functions = []
+        while self.pending:
+            name, schema = self.pending.pop(0)
+            lines = []
+            self.emit(schema, "x", lines, 1)
+            functions.append(f"\n\ndef {name}(x, path, out):\n" + "\n".join(lines or ["    pass"]))
+        digest = hashlib.sha256(json.dumps(self.root, sort_keys=True).encode()).hexdigest()
+        return ('"""Generated by schema_compiler.py; do not edit."""\n'
+                + _RUNTIME + f"\nSCHEMA_SHA256 = {digest!r}\n"
+                + "".join(functions)
+                # Constants last: some of them refer to the functions above
+                + "\n\n" + "".join(line + "\n" for line in self.constants)
+                + f"\nvalidate = {entry}\n")
+
+    def emit(self, schema, v, lines, depth):
+        """Append the checks of `schema` on the value named `v` to `lines`."""
+        ind = "    " * depth
+
+        def error(message_source, extra=0):
+            lines.append(f"{ind}{'    ' * extra}out.append((tuple(path), {message_source}))")
+
+        if schema is True:
+            return
+        if schema is False:
+            error(f"'False schema does not allow ' + repr({v})")
+            return
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema(f"schema must be an object or boolean, not {schema!r}")
+        unknown = set(schema) - SUPPORTED - ANNOTATIONS
+        if unknown:
+            raise UnsupportedSchema(f"keyword(s) {', '.join(sorted(unknown))}")
+
+        if "$ref" in schema:
+            # Draft 7: $ref overrides its sibling keywords
+            lines.append(f"{ind}{self.function_for(self.resolve(schema['$ref']))}({v}, path, out)")
+            return
+
+        for keyword, value in schema.items():
+            if keyword == "type":
+                types = value if isinstance(value, list) else [value]
+                if any(t not in _TYPE_CHECKS for t in types):
+                    raise UnsupportedSchema(f"type {value!r}")
+                test = " or ".join(_TYPE_CHECKS[t].format(v=v) for t in types)
+                lines.append(f"{ind}if not ({test}):")
+                error(f"repr({v}) + {' is not of type ' + ', '.join(repr(t) for t in types)!r}", 1)
+
+            elif keyword == "enum":
+                if not all(isinstance(each, str) for each in value):
+                    raise UnsupportedSchema("enum with non-string values")
+                values = self.constant(f"frozenset({sorted(set(value))!r})")
+                lines.append(f"{ind}if not (isinstance({v}, str) and {v} in {values}):")
+                error(f"repr({v}) + {' is not one of ' + repr(value)!r}", 1)
+
+            elif keyword in ("minLength", "maxLength", "minItems", "maxItems"):
+                kind = "str" if keyword.endswith("Length") else "list"
+                if keyword.startswith("min"):
+                    test = f"len({v}) < {value}"
+                    message = "should be non-empty" if value == 1 else "is too short"
+                else:
+                    test = f"len({v}) > {value}"
+                    message = "is expected to be empty" if value == 0 else "is too long"
+                lines.append(f"{ind}if isinstance({v}, {kind}) and {test}:")
+                error(f"repr({v}) + {' ' + message!r}", 1)
+
+            elif keyword == "required":
+                if not value:
+                    continue
+                lines.append(f"{ind}if isinstance({v}, dict):")
+                for prop in value:
+                    lines.append(f"{ind}    if {prop!r} not in {v}:")
+                    error(repr(f"{prop!r} is a required property"), 2)
+
+            elif keyword == "properties":
+                lines.append(f"{ind}if isinstance({v}, dict):")
+                emitted = len(lines)
+                for prop, sub in value.items():
+                    if sub is True or sub == {}:
+                        continue
+                    child = self.variable()
+                    lines.append(f"{ind}    if {prop!r} in {v}:")
+                    lines.append(f"{ind}        {child} = {v}[{prop!r}]")
+                    lines.append(f"{ind}        path.append({prop!r})")
+                    self.emit(sub, child, lines, depth + 2)
+                    lines.append(f"{ind}        path.pop()")
+                if len(lines) == emitted:
+                    lines.pop()
+
+            elif keyword == "patternProperties":
+                lines.append(f"{ind}if isinstance({v}, dict):")
+                for pattern, sub in value.items():
+                    regex = self.constant(f"re.compile({pattern!r})")
+                    key, child = self.variable(), self.variable()
+                    lines.append(f"{ind}    for {key}, {child} in {v}.items():")
+                    lines.append(f"{ind}        if {regex}.search({key}):")
+                    lines.append(f"{ind}            path.append({key})")
+                    self.emit(sub, child, lines, depth + 3)
+                    lines.append(f"{ind}            path.pop()")
+
+            elif keyword == "additionalProperties":
+                if value is True or value == {}:
+                    continue
+                known = self.constant(f"frozenset({sorted(schema.get('properties', {}))!r})")
+                patterns = schema.get("patternProperties", {})
+                extras, key = self.variable(), self.variable()
+                lines.append(f"{ind}if isinstance({v}, dict):")
+                if patterns:
+                    regex = self.constant(f"re.compile({'|'.join(patterns)!r})")
+                    lines.append(f"{ind}    {extras} = [{key} for {key} in {v} "
+                                 f"if {key} not in {known} and not {regex}.search({key})]")
+                else:
+                    lines.append(f"{ind}    {extras} = [{key} for {key} in {v} if {key} not in {known}]")
+                if value is False:
+                    lines.append(f"{ind}    if {extras}:")
+                    if patterns:
+                        shown = ", ".join(repr(p) for p in sorted(patterns))
+                        error(f"_regex_message({extras}, {shown!r})", 2)
+                    else:
+                        error(f"_extras_message({extras})", 2)
+                else:
+                    lines.append(f"{ind}    for {key} in {extras}:")
+                    lines.append(f"{ind}        path.append({key})")
+                    self.emit(value, f"{v}[{key}]", lines, depth + 2)
+                    lines.append(f"{ind}        path.pop()")
+
+            elif keyword == "items":
+                lines.append(f"{ind}if isinstance({v}, list):")
+                if isinstance(value, list):
+                    for index, sub in enumerate(value):
+                        lines.append(f"{ind}    if len({v}) > {index}:")
+                        lines.append(f"{ind}        path.append({index})")
+                        self.emit(sub, f"{v}[{index}]", lines, depth + 2)
+                        lines.append(f"{ind}        path.pop()")
+                else:
+                    index, child = self.variable(), self.variable()
+                    lines.append(f"{ind}    for {index}, {child} in enumerate({v}):")
+                    lines.append(f"{ind}        path.append({index})")
+                    self.emit(value, child, lines, depth + 2)
+                    lines.append(f"{ind}        path.pop()")
+
+            elif keyword == "allOf":
+                for sub in value:
+                    self.emit(sub, v, lines, depth)
+
+            elif keyword in ("anyOf", "oneOf"):
+                checks = "(" + "".join(self.function_for(sub) + ", " for sub in value) + ")"
+                checks = self.constant(checks)
+                if keyword == "anyOf":
+                    lines.append(f"{ind}_any_of({checks}, {v}, path, out)")
+                else:
+                    reprs = self.constant(repr(tuple(repr(sub) for sub in value)))
+                    lines.append(f"{ind}_one_of({checks}, {reprs}, {v}, path, out)")
+
+
+def generate_source(schema):
+    """Python source of a module whose validate(x, path, out) checks `schema`."""
+    return _Compiler(schema).module()
+
+
+def compile_validator(schema):
+    return CompiledValidator(schema, generate_source(schema))
+
+
+def _error_keys(errors):
+    return sorted((tuple(e.path), e.message) for e in errors)
+
+
+def cross_check(pattern, schemapath):
+    """Compare the compiled validator with Draft7Validator node by node on the
+    AST files matching `pattern`. Returns the number of nodes that differ."""
+    from jsonschema import Draft7Validator
+    from validator import find_ast_files, item_schema, iter_ast_items, loadjson, node_name
+
+    schema = item_schema(loadjson(schemapath))
+    reference, compiled = Draft7Validator(schema), compile_validator(schema)
+    nodes = differ = 0
+    reference_s = compiled_s = 0.0
+    for astpath in find_ast_files(pattern):
+        for index, node in enumerate(iter_ast_items(astpath)):
+            nodes += 1
+            started = time.perf_counter()
+            expected = _error_keys(reference.iter_errors(node))
+            reference_s += time.perf_counter() - started
+            started = time.perf_counter()
+            actual = _error_keys(compiled.iter_errors(node))
+            compiled_s += time.perf_counter() - started
+            if actual != expected:
+                differ += 1
+                print(f"❌ {astpath}: {node_name(node, index)}")
+                for path, message in sorted(set(expected) ^ set(actual))[:5]:
+                    side = "jsonschema only" if (path, message) in expected else "compiled only"
+                    print(f"    - {side}: {' -> '.join(str(p) for p in path)}: {message}")
+    speedup = reference_s / compiled_s if compiled_s else float("inf")
+    print(f"\n{'✅' if not differ else '❌'} {nodes} node(s) checked, {differ} differ; "
+          f"jsonschema {reference_s:.3f}s, compiled {compiled_s:.3f}s ({speedup:.1f}x)")
+    return differ
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compile a JSON schema into a Python validator")
+    arg_parser.add_argument("schema", nargs="?", default="fixedSchema/fixedschema.json")
+    arg_parser.add_argument("--items", action="store_true",
+                            help="Compile the schema of one array element (what validator.py checks per procedure)")
+    arg_parser.add_argument("--output", help="Write the generated module here (default: print it)")
+    arg_parser.add_argument("--check", metavar="AST",
+                            help="Cross-check against jsonschema on an AST file, directory or glob instead")
+    args = arg_parser.parse_args()
+
+    if args.check:
+        sys.exit(1 if cross_check(args.check, args.schema) else 0)
+
+    with open(args.schema, encoding="utf-8") as f:
+        schema = json.load(f)
+    if args.items:
+        from validator import item_schema
+        schema = item_schema(schema)
+    try:
+        source = generate_source(schema)
+    except UnsupportedSchema as e:
+        print(f"❌ Cannot compile {args.schema}: unsupported {e}")
+        sys.exit(1)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(source)
+        print(f"✅ Validator for {args.schema} written to: {args.output}")
+    else:
+        print(source)
@@ -0,0 +1,156 @@
+"""Synthetic stored procedures for benchmarking ASTBuilder at scale.
+
+Each shape takes one trait of the procedures in input/ and grows it until
+the procedure reaches (roughly) the requested number of lines:
+
+    statements  the SET/SELECT/UPDATE/INSERT/DELETE/IF/EXEC mix of the
+                payroll and costing samples, repeated
+    nesting     IF/WHILE/BEGIN-END chains as in edge_case_nested_if_while.sql,
+                nested `depth` levels deep and repeated
+    cursor      one cursor loop as in edge_full_cursor_block.sql whose FETCH
+                list and loop body keep widening
+    insert      INSERT ... VALUES with ever longer column and value lists
+
+Usage:
+    python synth_sql.py --shape all --lines 10000 100000 --output-dir bench_input
+"""
+import argparse
+import os
+
+SHAPES = ("statements", "nesting", "cursor", "insert")
+
+# Counter variables shared by the statement templates
+_COUNTERS = 10
+
+_STATEMENTS = [
+    "SET @Total{v} = @Total{v} + {i}",
+    "SELECT @Rate = ExchangeRate FROM CurrencyRates\n"
+    "    WHERE CurrencyCode = 'C{i}' AND RateDate <= @AsOf",
+    "UPDATE Employees SET Bonus = Bonus + {i}\n"
+    "    WHERE EmployeeID = @EmployeeID AND DepartmentID = {i}",
+    "INSERT INTO AuditLog (EventID, Message, CreatedAt)\n"
+    "    VALUES ({i}, 'step {i}', GETDATE())",
+    "DELETE FROM #Work WHERE RowID = {i}",
+    "IF @Total{v} > {i}\n"
+    "BEGIN\n"
+    "    PRINT 'over {i}'\n"
+    "END\n"
+    "ELSE\n"
+    "    SET @Total{v} = 0",
+    "EXEC log_event {i}",
+]
+
+
+def _indent(text, level):
+    pad = "    " * level
+    return "\n".join(pad + line for line in text.split("\n"))
+
+
+def _statement(i):
+    return _STATEMENTS[i % len(_STATEMENTS)].format(i=i, v=i % _COUNTERS)
+
+
+def _procedure(name, body, declarations=()):
+    lines = [f"CREATE PROCEDURE dbo.{name}", "    @AsOf DATE,", "    @EmployeeID INT", "AS", "BEGIN"]
+    lines += [f"    DECLARE @Total{v} INT" for v in range(_COUNTERS)]
+    lines += ["    DECLARE @Rate DECIMAL(18,6)"]
+    lines += [f"    {d}" for d in declarations]
+    lines += body
+    lines += ["END", "GO", ""]
+    return "\n".join(lines)
+
+
+def statements_proc(lines, name="synth_statements"):
+    body, count, i = [], 20, 0
+    while count < lines:
+        stmt = _indent(_statement(i), 1)
+        body.append(stmt)
+        count += stmt.count("\n") + 1
+        i += 1
+    return _procedure(name, body)
+
+
+def nesting_proc(lines, name="synth_nesting", depth=50):
+    body, count, block = [], 20, 0
+    while count < lines:
+        # IF > WHILE > IF > ... `depth` levels, one statement per level
+        opened = []
+        for level in range(depth):
+            pad = "    " * (level + 1)
+            keyword = "IF" if level % 2 == 0 else "WHILE"
+            op = ">" if keyword == "IF" else "<"
+            body.append(f"{pad}{keyword} @Total{level % _COUNTERS} {op} {block * depth + level}")
+            body.append(f"{pad}BEGIN")
+            body.append(_indent(_statement(block * depth + level), level + 2))
+            opened.append(f"{pad}END")
+        body.extend(reversed(opened))
+        count = sum(b.count("\n") + 1 for b in body) + 20
+        block += 1
+    return _procedure(name, body)
+
+
+def cursor_proc(lines, name="synth_cursor", width=None):
+    # The FETCH list widens with the procedure: ~1/10 of the lines by default
+    width = width or max(2, lines // 10)
+    cols = [f"Col{c}" for c in range(width)]
+    vars_ = [f"@Col{c}" for c in range(width)]
+    declarations = [f"DECLARE @Col{c} VARCHAR(100)" for c in range(width)]
+    fetch = "FETCH NEXT FROM synth_cursor INTO " + ", ".join(vars_)
+    body = [
+        "    DECLARE synth_cursor CURSOR FOR",
+        "    SELECT " + ", ".join(cols) + " FROM WideSource WHERE Active = 1",
+        "    OPEN synth_cursor",
+        "    " + fetch,
+        "    WHILE @@FETCH_STATUS = 0",
+        "    BEGIN",
+    ]
+    count, i = 30 + width, 0
+    while count < lines:
+        stmt = _indent(_statement(i), 2)
+        body.append(stmt)
+        count += stmt.count("\n") + 1
+        i += 1
+    body += ["        " + fetch, "    END", "    CLOSE synth_cursor", "    DEALLOCATE synth_cursor"]
+    return _procedure(name, body, declarations)
+
+
+def insert_proc(lines, name="synth_insert"):
+    width = max(1, (lines - 25) // 2)
+    body = ["    INSERT INTO WideTarget ("]
+    body += [f"        Col{c}," for c in range(width - 1)] + [f"        Col{width - 1}"]
+    body += ["    )", "    VALUES ("]
+    body += [f"        @Total{c % _COUNTERS} + {c}," for c in range(width - 1)]
+    body += [f"        @Total{(width - 1) % _COUNTERS} + {width - 1}", "    )"]
+    return _procedure(name, body)
+
+
+GENERATORS = {
+    "statements": statements_proc,
+    "nesting": nesting_proc,
+    "cursor": cursor_proc,
+    "insert": insert_proc,
+}
+
+
+def generate(shape, lines, output_dir):
+    """Write one synthetic procedure and return its path."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"synth_{shape}_{lines}.sql")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(GENERATORS[shape](lines, name=f"synth_{shape}_{lines}"))
+    return path
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Generate large synthetic stored procedures for benchmarking")
+    arg_parser.add_argument("--shape", choices=SHAPES + ("all",), default="all")
+    arg_parser.add_argument("--lines", type=int, nargs="+", default=[10000],
+                            help="Approximate size(s) of each procedure in lines")
+    arg_parser.add_argument("--output-dir", default="bench_input")
+    args = arg_parser.parse_args()
+
+    shapes = SHAPES if args.shape == "all" else (args.shape,)
+    for shape in shapes:
+        for lines in args.lines:
+            print(f"✅ {generate(shape, lines, args.output_dir)}")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules under test are top-level scripts of the repository, and the
+# generated grammar lives in grammar/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "grammar")]
@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("TSqlParser", reason="generate the Python parser from grammar/ first")
+
+from antlr4 import InputStream, Token  # noqa: E402
+from TSqlLexer import TSqlLexer  # noqa: E402
+from ast_listener import normalize_sql, normalize_tokens  # noqa: E402
+
+
+def tokens(sql):
+    lexer = TSqlLexer(InputStream(sql))
+    return [t for t in lexer.getAllTokens() if t.channel == Token.DEFAULT_CHANNEL]
+
+
+@pytest.mark.parametrize("sql, expected", [
+    # keywords and identifiers keep their case; whitespace collapses
+    ("select  a,b\n  from [dbo].[T] where x<>1;", "select a, b from [dbo].[T] where x <> 1"),
+    # @variables and operators, trailing semicolons dropped
+    ("SET @total=@total+1;;", "SET @total = @total + 1"),
+    ("@a>=@b AND c ! = 2", "@a >= @b AND c != 2"),
+    ("IF @Rate IS  NOT NULL RETURN", "IF @Rate IS NOT NULL RETURN"),
+    ("WHILE @@FETCH_STATUS=0", "WHILE @@FETCH_STATUS = 0"),
+])
+def test_matches_normalize_sql(sql, expected):
+    assert normalize_tokens(tokens(sql)) == expected
+    assert normalize_sql(sql) == expected
+
+
+def test_string_literals_are_verbatim():
+    # normalize_sql would also collapse the spaces and the comma inside the literal
+    assert normalize_tokens(tokens("PRINT  'it''s  a,b'")) == "PRINT 'it''s  a,b'"
+    assert normalize_tokens(tokens("SET @n=N'x  y'")) == "SET @n = N'x  y'"
+
+
+@pytest.mark.parametrize("sql", [
+    "IF @Rate IS NULL SELECT a,b FROM T",
+    "UPDATE T SET c=1 WHERE d<>2",
+])
+def test_glued_matches_normalize_sql_of_get_text(sql):
+    toks = tokens(sql)
+    assert normalize_tokens(toks, glued=True) == normalize_sql("".join(t.text for t in toks))
+
+
+def test_mismatched_context_pop_resyncs():
+    from ast_listener import ASTBuilder
+    builder = ASTBuilder()
+    builder._push_context("INSERT")
+    builder._push_context("CURSOR")
+    builder._pop_context("CATCH")  # never opened: reported, stack kept
+    assert builder.context_stack == ["INSERT", "CURSOR"]
+    builder._pop_context("INSERT")  # closes the CURSOR opened inside it too
+    assert builder.context_stack == []
+    assert not builder.in_insert and not builder.in_cursor
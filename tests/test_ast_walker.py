@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("TSqlParser", reason="generate the Python parser from grammar/ first")
+
+from TSqlParser import TSqlParser  # noqa: E402
+from ast_listener import ASTBuilder  # noqa: E402
+from ast_walker import ASTWalker, rule_calls  # noqa: E402
+
+
+def test_rule_calls_stop_at_the_end_of_the_rule():
+    callees = rule_calls()[TSqlParser.RULE_expression]
+    assert TSqlParser.RULE_primitive_expression in callees
+    assert TSqlParser.RULE_batch not in callees
+    assert TSqlParser.RULE_create_table not in callees
+
+
+@pytest.mark.parametrize("ctx_class", [
+    TSqlParser.Id_Context,
+    TSqlParser.ConstantContext,
+    TSqlParser.Primitive_expressionContext,
+    TSqlParser.Full_column_nameContext,
+    TSqlParser.Data_typeContext,
+])
+def test_leaf_rules_are_not_descended(ctx_class):
+    enter, exit_, descend = ASTWalker()._plan(ASTBuilder)[ctx_class]
+    assert (enter, exit_, descend) == (None, None, False)
+
+
+def test_rules_reaching_a_hook_are_descended():
+    plan = ASTWalker()._plan(ASTBuilder)
+    # An expression can hold a subquery, whose SELECT ASTBuilder hooks
+    assert plan[TSqlParser.ExpressionContext][2]
+    assert plan[TSqlParser.BatchContext][2]
+    assert sum(descend for _, _, descend in plan.values()) < len(plan) // 2
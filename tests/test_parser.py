@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+from parser import output_path_for, output_paths
+
+
+def test_output_path_for():
+    assert output_path_for(os.path.join("input", "08_sp_X.sql"), "out") == os.path.join("out", "ast_08_sp_X.json")
+    assert output_path_for("sp.sql", "out", "jsonl") == os.path.join("out", "ast_sp.jsonl")
+
+
+def test_output_paths_rejects_colliding_basenames():
+    files = [os.path.join("a", "proc.sql"), os.path.join("b", "proc.sql")]
+    with pytest.raises(ValueError, match="would both be written"):
+        output_paths(files, "out")
+    assert output_paths(files[:1] + [os.path.join("b", "other.sql")], "out") == {
+        files[0]: os.path.join("out", "ast_proc.json"),
+        os.path.join("b", "other.sql"): os.path.join("out", "ast_other.json"),
+    }
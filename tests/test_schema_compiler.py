@@ -0,0 +1,70 @@
+import copy
+import glob
+import os
+
+import pytest
+from jsonschema import Draft7Validator
+
+from schema_compiler import compile_validator
+from validator import item_schema, iter_ast_items, loadjson
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA = item_schema(loadjson(os.path.join(ROOT, "fixedSchema", "fixedschema.json")))
+REFERENCE = Draft7Validator(SCHEMA)
+COMPILED = compile_validator(SCHEMA)
+
+PROCEDURE = {
+    "proc_name": "sp_test",
+    "params": [{"name": "@id", "type": "INT", "mode": "IN"}],
+    "return_type": "VOID",
+    "variables": [],
+    "statements": [{"type": "RETURN"}],
+}
+
+
+def errors(validator, node):
+    return sorted((tuple(e.path), e.message) for e in validator.iter_errors(node))
+
+
+def sample_nodes():
+    for astpath in sorted(glob.glob(os.path.join(ROOT, "output", "*.json"))):
+        for index, node in enumerate(iter_ast_items(astpath)):
+            yield pytest.param(node, id=f"{os.path.basename(astpath)}#{index}")
+
+
+def broken(change):
+    node = copy.deepcopy(PROCEDURE)
+    change(node)
+    return node
+
+
+BROKEN = {
+    "missing_required": broken(lambda n: n.pop("return_type")),
+    "wrong_type": broken(lambda n: n.update(proc_name=42)),
+    "wrong_item_type": broken(lambda n: n["params"].append("@x")),
+    "extra_property": broken(lambda n: n.update(owner="dbo")),
+    "extra_nested_property": broken(lambda n: n["params"][0].update(size=10)),
+    "enum_miss": broken(lambda n: n["params"][0].update(type="INTEGER")),
+    "statement_enum_miss": broken(lambda n: n["statements"].append({"type": "NOPE"})),
+    "not_an_object": [PROCEDURE],
+}
+
+
+def test_reference_procedure_is_valid():
+    assert errors(REFERENCE, PROCEDURE) == []
+    assert COMPILED.is_valid(PROCEDURE)
+
+
+@pytest.mark.parametrize("node", list(sample_nodes()))
+def test_matches_jsonschema_on_samples(node):
+    expected = errors(REFERENCE, node)
+    assert errors(COMPILED, node) == expected
+    assert COMPILED.is_valid(node) == (not expected)
+
+
+@pytest.mark.parametrize("node", BROKEN.values(), ids=BROKEN.keys())
+def test_matches_jsonschema_on_broken_nodes(node):
+    expected = errors(REFERENCE, node)
+    assert expected, "mutation should make the node invalid"
+    assert errors(COMPILED, node) == expected
+    assert not COMPILED.is_valid(node)
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from validator import iter_ast_items
+
+NODES = [{"proc_name": "p", "params": [1, 2.5e-3]}, 1234567, 2.5e10, -0.5e2, True, None, "x"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 6, 7, 12, 14, 1 << 20])
+def test_array_split_across_reads(tmp_path, chunk_size):
+    path = tmp_path / "ast.json"
+    path.write_text(" \n[1234567, 2.5e10, true, null, \"x\"]\n")
+    assert list(iter_ast_items(str(path), chunk_size)) == [1234567, 2.5e10, True, None, "x"]
+
+    path.write_text(json.dumps(NODES, indent=2))
+    assert list(iter_ast_items(str(path), chunk_size)) == NODES
+
+
+def test_json_lines(tmp_path):
+    path = tmp_path / "ast.jsonl"
+    path.write_text('{"proc_name": "a"}\n\n{"proc_name": "b"}\n')
+    assert [n["proc_name"] for n in iter_ast_items(str(path), 4)] == ["a", "b"]
+
+
+@pytest.mark.parametrize("name, text", [
+    ("empty.json", ""),
+    ("blank.json", "  \n"),
+    ("object.json", '{"a": 1}'),
+    ("pretty.json", '{\n  "a": 1\n}\n'),
+    ("scalars.jsonl", '{"a": 1}\n2\n'),
+    ("truncated.json", '[{"a": 1}, {"b"'),
+])
+def test_rejects_non_ast_files(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(iter_ast_items(str(path), 3))
@@ -0,0 +1,158 @@
+"""Per-phase wall time instrumentation for parser.py.
+
+When enabled (parser.py --timing-report), every file and GO batch gets a
+record of the time spent in each phase:
+
+    lex        TSqlLexer tokenization
+    parse      TSqlParser prediction / tree building
+    walk       ASTBuilder callbacks
+    serialize  JSON encoding and writing of the AST
+    validate   JSON schema checking (parser.py --schema)
+
+plus token, parse tree node and AST node counts. Phases are exclusive: a
+phase started inside another one (e.g. a JSON line written from an
+ASTBuilder callback in --format jsonl) is not counted twice. While no
+timer is enabled, phase() is a shared no-op context manager.
+"""
+import json
+import platform
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+PHASES = ("lex", "parse", "walk", "serialize", "validate")
+
+TIMER = None
+
+_NO_TIMING = nullcontext()
+
+
+def enable():
+    global TIMER
+    TIMER = PhaseTimer()
+    return TIMER
+
+
+def phase(name):
+    return TIMER.phase(name) if TIMER else _NO_TIMING
+
+
+def count_tree_nodes(tree):
+    """Number of rule and token nodes in a parse tree (without recursing)."""
+    count = 0
+    stack = [tree]
+    while stack:
+        t = stack.pop()
+        count += 1
+        children = getattr(t, "children", None)
+        if children:
+            stack.extend(children)
+    return count
+
+
+def _new_record(**fields):
+    record = dict(fields)
+    record.update({p: 0.0 for p in PHASES})
+    record.update(tokens=0, tree_nodes=0, ast_nodes=0)
+    return record
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.files = []
+        self.file = None
+        self.batch = None
+        self._running = []  # [phase, started] of the open phases
+
+    def begin_file(self, path):
+        self.file = _new_record(file=path, lines=_count_lines(path), batches=[])
+        self.batch = None
+        self.files.append(self.file)
+        return self.file
+
+    def begin_batch(self, tokens, lex_seconds):
+        first_line = tokens[0].line if tokens else 0
+        self.batch = _new_record(index=len(self.file["batches"]), line=first_line)
+        self.file["batches"].append(self.batch)
+        self.add("lex", lex_seconds)
+        self.count("tokens", len(tokens))
+
+    def end_batch(self):
+        self.batch = None
+
+    def timed_batches(self, batches):
+        """Wrap split_batches(): the lexer runs while the next batch is built."""
+        batches = iter(batches)
+        while True:
+            started = time.perf_counter()
+            tokens = next(batches, None)
+            if tokens is None:
+                self.add("lex", time.perf_counter() - started)
+                return
+            self.begin_batch(tokens, time.perf_counter() - started)
+            yield tokens
+            self.end_batch()
+
+    def counting(self, emit):
+        """Wrap an emit callback so every top-level AST node is counted."""
+        def emit_counted(node):
+            self.count("ast_nodes", 1)
+            emit(node)
+        return emit_counted
+
+    def add(self, name, seconds):
+        for record in (self.file, self.batch):
+            if record is not None:
+                record[name] += seconds
+
+    def count(self, name, n):
+        for record in (self.file, self.batch):
+            if record is not None:
+                record[name] += n
+
+    @contextmanager
+    def phase(self, name):
+        now = time.perf_counter()
+        if self._running:
+            outer = self._running[-1]
+            self.add(outer[0], now - outer[1])
+        self._running.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.add(name, now - self._running.pop()[1])
+            if self._running:
+                self._running[-1][1] = now
+
+    def merge(self, files):
+        # Records timed in pool workers
+        self.files.extend(files)
+
+    def report(self):
+        totals = _new_record(files=len(self.files), lines=0, batches=0)
+        for record in self.files:
+            for key in PHASES + ("tokens", "tree_nodes", "ast_nodes", "lines"):
+                totals[key] += record[key]
+            totals["batches"] += len(record["batches"])
+        totals["total"] = sum(totals[p] for p in PHASES)
+        for record in self.files:
+            record["total"] = sum(record[p] for p in PHASES)
+        return {
+            "python": platform.python_version(),
+            "argv": sys.argv,
+            "totals": totals,
+            "files": self.files,
+        }
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def _count_lines(path):
+    try:
+        with open(path, "rb") as f:
+            return sum(1 for _ in f)
+    except OSError:
+        return 0
@@ -1,5 +1,10 @@
+import argparse
+import glob
 import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from jsonschema import Draft7Validator, ValidationError
 from pathlib import Path
 
@@ -14,29 +19,251 @@ def loadjson(filepath):
         print(f"JSON parsing error in {filepath}: {e}")
         sys.exit(1)
 
-def validate_ast(astpath, schemapath):
-    astarray = loadjson(astpath)
-    schema = loadjson(schemapath)
-
-    validator = Draft7Validator(schema)
-    errors = sorted(validator.iter_errors(astarray), key=lambda e: e.path)
-    if errors:
-        print("\nValidation errors in AST:")
-        for err in errors:
-            print(f"  - Error: {err.message}")
-            print(f"    Path : {' -> '.join(str(p) for p in err.path)}")
-        print("\nOne or more procedures failed schema validation.")
+def load_validator(schemapath):
+    return Draft7Validator(loadjson(schemapath))
+
+def schema_errors(astarray, validator):
+    return sorted(validator.iter_errors(astarray), key=lambda e: e.path)
+
+def item_schema(schema):
+    """The schema of one AST array element, keeping the shared definitions."""
+    sub = dict(schema["items"])
+    sub.setdefault("definitions", schema.get("definitions", {}))
+    if "$schema" in schema:
+        sub.setdefault("$schema", schema["$schema"])
+    return sub
+
+def load_item_validator(schemapath, fast=False):
+    """Validator for one AST node; with fast=True compiled by schema_compiler.py."""
+    schema = item_schema(loadjson(schemapath))
+    if fast:
+        from schema_compiler import UnsupportedSchema, compile_validator
+        try:
+            return compile_validator(schema)
+        except UnsupportedSchema as e:
+            print(f"⚠️ Using jsonschema: cannot compile {schemapath} (unsupported {e})")
+    return Draft7Validator(schema)
+
+# Characters that may follow a complete number, true, false or null
+_DELIMITERS = " \t\r\n,]"
+
+def iter_ast_items(astpath, chunk_size=1 << 20):
+    """Yield each top-level node of an AST file without loading the whole file.
+
+    Accepts the JSON array written by parser.py (--format json) or one node
+    per line (--format jsonl). Only the node being decoded is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(astpath, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        while buf.strip() == "":
+            more = f.read(chunk_size)
+            if not more:
+                if astpath.endswith(".jsonl"):
+                    return  # --format jsonl output of a file without procedures
+                raise ValueError("empty file")
+            buf = more
+        pos = len(buf) - len(buf.lstrip())
+        if buf[pos] != "[":
+            f.seek(0)
+            yield from _iter_json_lines(f, astpath)
+            return
+
+        pos += 1
+        eof = False
+        while True:
+            # Skip whitespace and the comma between elements
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+            if pos >= len(buf):
+                raise ValueError("unterminated JSON array")
+            if buf[pos] == "]":
+                return
+            try:
+                node, end = decoder.raw_decode(buf, pos)
+                # Objects, arrays and strings end with their own closing
+                # character; anything else (2 of 2.5e10, say) is complete
+                # only once a delimiter follows it
+                complete = isinstance(node, (dict, list, str)) or eof or (
+                    end < len(buf) and buf[end] in _DELIMITERS)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(str(e)) from None
+                complete = False
+            if not complete:
+                # The element continues in the next chunk; read at least
+                # as much again so a huge element is decoded O(size) times
+                more = f.read(max(chunk_size, len(buf) - pos))
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield node
+            pos = end
+
+def _iter_json_lines(f, astpath):
+    """Nodes of a JSON Lines file; every non-blank line must be a JSON object."""
+    first = None
+    count = 0
+    for lineno, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            node = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"neither a JSON array nor JSON Lines (line {lineno}: {e})") from None
+        if not isinstance(node, dict):
+            raise ValueError(f"line {lineno}: expected a JSON object, got {type(node).__name__}")
+        count += 1
+        if count == 1 and not astpath.endswith(".jsonl"):
+            # Held back: unless the file is named .jsonl, a lone object
+            # is a JSON document rather than an AST array
+            first = node
+            continue
+        if first is not None:
+            yield first
+            first = None
+        yield node
+    if first is not None:
+        raise ValueError("expected a JSON array of AST nodes, got a single object")
+
+def node_name(node, index):
+    if isinstance(node, dict):
+        name = node.get("proc_name") or node.get("schema_name") or node.get("type")
+        if name:
+            return f"{name} (#{index})"
+    return f"#{index}"
+
+def iter_node_errors(astpath, validator):
+    """Yield (index, node, errors) for every node of `astpath`, one at a time."""
+    for index, node in enumerate(iter_ast_items(astpath)):
+        yield index, node, sorted(validator.iter_errors(node), key=lambda e: e.path)
+
+def validate_ast(astpath, schemapath, fast=False):
+    validator = load_item_validator(schemapath, fast)
+    count = 0
+    failed = 0
+    try:
+        for index, node, errors in iter_node_errors(astpath, validator):
+            count += 1
+            if not errors:
+                continue
+            if not failed:
+                print("\nValidation errors in AST:")
+            failed += 1
+            print(f"\n  {node_name(node, index)}: {len(errors)} error(s)")
+            for err in errors:
+                print(f"  - Error: {err.message}")
+                print(f"    Path : {' -> '.join(str(p) for p in [index, *err.path])}", flush=True)
+    except FileNotFoundError:
+        print(f"File not found: {astpath}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"JSON parsing error in {astpath}: {e}")
+        sys.exit(1)
+    if failed:
+        print(f"\n{failed} of {count} procedure(s) failed schema validation.")
         sys.exit(1)
     else:
-        print("\nAll procedures are valid according to schema.")
+        print(f"\nAll {count} procedures are valid according to schema.")
 
-if __name__ == "__main__":
-    astfile = sys.argv[1] if len(sys.argv) > 1 else "../output_data/ast.json"
-    schemafile = sys.argv[2] if len(sys.argv) > 2 else "../Tool2/fixedSchema/fixedSchema.json"
+def find_ast_files(pattern):
+    """AST files of a directory (*.json and *.jsonl inside it) or matching a glob."""
+    if os.path.isdir(pattern):
+        return sorted(glob.glob(os.path.join(pattern, "*.json")) +
+                      glob.glob(os.path.join(pattern, "*.jsonl")))
+    return sorted(glob.glob(pattern, recursive=True))
+
+def check_file(astpath, validator, limit=5):
+    """Validate one AST file; summary dict with its first `limit` error messages."""
+    started = time.perf_counter()
+    result = {"file": astpath, "procedures": 0, "failed": 0, "errors": 0, "messages": []}
+    try:
+        for index, node, errors in iter_node_errors(astpath, validator):
+            result["procedures"] += 1
+            if not errors:
+                continue
+            result["failed"] += 1
+            result["errors"] += len(errors)
+            for err in errors[:max(0, limit - len(result["messages"]))]:
+                path = " -> ".join(str(p) for p in [index, *err.path])
+                result["messages"].append(f"{node_name(node, index)}: {path}: {err.message}")
+    except (OSError, ValueError) as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - started
+    return result
 
-    print(f"Validating AST: {astfile}")
-    print(f"Using Schema : {schemafile}\n")
+_worker_validator = None
 
-    validate_ast(astfile, schemafile)
+def _init_worker(schemapath, fast=False):
+    # Runs once per pool worker: the schema is compiled once, not per file
+    global _worker_validator
+    _worker_validator = load_item_validator(schemapath, fast)
+
+def _check_job(astpath):
+    return check_file(astpath, _worker_validator)
+
+def validate_many(pattern, schemapath, workers=None, summary_path=None, fast=False):
+    """Validate every AST file matching `pattern` over a process pool and
+    print one summary. Returns the number of files with errors."""
+    files = find_ast_files(pattern)
+    files.sort(key=os.path.getsize, reverse=True)
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(schemapath, fast)) as pool:
+        futures = [pool.submit(_check_job, path) for path in files]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if "error" in result:
+                print(f"❌ {result['file']}: {result['error']}")
+            elif result["failed"]:
+                print(f"❌ {result['file']}: {result['failed']}/{result['procedures']} procedure(s), "
+                      f"{result['errors']} error(s) ({result['seconds']:.2f}s)")
+                for message in result["messages"]:
+                    print(f"    - {message}")
+            else:
+                print(f"✅ {result['file']}: {result['procedures']} procedure(s) ({result['seconds']:.2f}s)")
+
+    results.sort(key=lambda r: r["file"])
+    bad = [r for r in results if "error" in r or r["failed"]]
+    totals = {
+        "files": len(results),
+        "invalid_files": len(bad),
+        "procedures": sum(r["procedures"] for r in results),
+        "failed_procedures": sum(r["failed"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+        "seconds": time.perf_counter() - started,
+        "file_seconds": sum(r["seconds"] for r in results),
+    }
+    print(f"\n{totals['files']} file(s), {totals['procedures']} procedure(s): "
+          f"{totals['failed_procedures']} procedure(s) in {totals['invalid_files']} file(s) "
+          f"with {totals['errors']} error(s), {totals['seconds']:.2f}s")
+    if summary_path:
+        with open(summary_path, "w") as f:
+            json.dump({"schema": schemapath, "totals": totals, "files": results}, f, indent=2)
+        print(f"Summary saved to: {summary_path}")
+    return len(bad)
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Validate AST JSON / JSONL against a JSON schema")
+    arg_parser.add_argument("ast", nargs="?", default="../output_data/ast.json",
+                            help="AST file, or a directory / glob of AST files to validate in parallel")
+    arg_parser.add_argument("schema", nargs="?", default="../Tool2/fixedSchema/fixedSchema.json")
+    arg_parser.add_argument("--workers", type=int, default=None,
+                            help="Worker processes for a directory or glob (default: CPU count)")
+    arg_parser.add_argument("--summary", help="Write the per-file summary of a directory or glob run to this JSON file")
+    arg_parser.add_argument("--fast", action="store_true",
+                            help="Validate with Python code compiled from the schema (see schema_compiler.py)")
+    args = arg_parser.parse_args()
 
+    print(f"Validating AST: {args.ast}")
+    print(f"Using Schema : {args.schema}\n")
 
+    if os.path.isdir(args.ast) or glob.has_magic(args.ast):
+        sys.exit(1 if validate_many(args.ast, args.schema, args.workers, args.summary, args.fast) else 0)
+    validate_ast(args.ast, args.schema, args.fast)